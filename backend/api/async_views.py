@@ -0,0 +1,127 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_cached_recipes_data
+from .snapshots import snapshot_response
+from .views import IngredientViewSet, TagViewSet
+
+RENDERER = JSONRenderer()
+# Кеш Django 3.2 синхронный, в том числе сетевые бэкенды: обращения
+# выполняются в пуле потоков, не занимая event loop
+get_cached_data = sync_to_async(
+    get_cached_recipes_data, thread_sensitive=False
+)
+
+
+def json_response(data):
+    response = HttpResponse(
+        RENDERER.render(data), content_type=RENDERER.media_type
+    )
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def accepts_json(request, kwargs):
+    """Запрос JSON без браузерного API DRF и суффикса формата."""
+    return (
+        request.method == "GET"
+        and "format" not in kwargs
+        and request.GET.get("format", "json") == "json"
+        and "text/html" not in request.META.get("HTTP_ACCEPT", "")
+    )
+
+
+def is_anonymous(request):
+    return (
+        "HTTP_AUTHORIZATION" not in request.META
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def recipes_fast_path(action):
+    """Ответ анонимному пользователю из кеша рецептов."""
+
+    async def fast_path(request, *args, **kwargs):
+        if not is_anonymous(request):
+            return None
+        _, data = await get_cached_data(request, action, kwargs)
+        if data is None:
+            return None
+        response = json_response(data)
+        response["X-Cache"] = "HIT"
+        return response
+
+    return fast_path
+
+
+def reference_fast_path(viewset, action):
+    """Справочник из снимка в памяти процесса."""
+
+    async def fast_path(request, *args, **kwargs):
+        if action == "list" and not viewset.uses_snapshot(request.GET):
+            return None
+        snapshot = viewset.snapshot.get_current()
+        if snapshot is None:
+            snapshot = await sync_to_async(viewset.snapshot.get)()
+        if action == "list":
+            data = list(viewset.filter_rows(snapshot, request.GET))
+        else:
+            pk = kwargs["pk"]
+            data = snapshot.rows_by_id.get(int(pk)) if pk.isdigit() else None
+            if data is None:
+                return None
+        return snapshot_response(
+            request, snapshot.version, data, response_class=json_response
+        )
+
+    return fast_path
+
+
+FAST_PATHS = {
+    "recipes-list": recipes_fast_path("list"),
+    "recipes-detail": recipes_fast_path("retrieve"),
+    "tags-list": reference_fast_path(TagViewSet, "list"),
+    "tags-detail": reference_fast_path(TagViewSet, "retrieve"),
+    "ingredients-list": reference_fast_path(IngredientViewSet, "list"),
+    "ingredients-detail": reference_fast_path(IngredientViewSet, "retrieve"),
+}
+
+
+def async_read_view(sync_view, fast_path):
+    """Асинхронная обертка над синхронным вьюсетом DRF.
+
+    GET запросы JSON, на которые можно ответить без ORM (кеш
+    рецептов, снимки справочников), обрабатываются в event loop.
+    Остальные передаются синхронному вьюсету в пуле потоков: в
+    Django 3.2 нет асинхронного ORM.
+    """
+    sync_handler = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if accepts_json(request, kwargs):
+            response = await fast_path(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_handler(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+def make_async(urlpatterns):
+    """Заменяет вьюхи чтения рецептов и справочников асинхронными."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback, FAST_PATHS[pattern.name]),
+            pattern.default_args,
+            pattern.name,
+        )
+        if pattern.name in FAST_PATHS
+        else pattern
+        for pattern in urlpatterns
+    ]
@@ -0,0 +1,82 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenUserCache:
+    """LRU кеш токен -> (пользователь, токен) в памяти процесса.
+
+    Записи живут не дольше ttl секунд: так удаление токена или смена
+    пароля в другом процессе учитываются с задержкой не больше ttl.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user, token = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        # Копии, чтобы изменения request.user не попадали в кеш
+        return copy.copy(user), token
+
+    def set(self, key, user, token):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, user, token)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self.lock:
+            for key in [
+                key
+                for key, (_, user, _) in self.entries.items()
+                if user.pk == user_id
+            ]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenUserCache(
+    settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, запоминающая пользователя токена.
+
+    Повторные запросы с тем же токеном не обращаются к БД, пока
+    запись не вытеснена или не устарела. Кеш сбрасывается при удалении
+    токена (выход) и при сохранении пользователя (смена пароля).
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache.ttl:
+            return super().authenticate_credentials(key)
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return copy.copy(user), token
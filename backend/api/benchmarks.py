@@ -0,0 +1,33 @@
+import math
+import statistics
+import time
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(func, *args, **kwargs):
+    """Время выполнения функции в секундах и ее результат."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def summarize(timings):
+    """Сводка по замерам в миллисекундах."""
+    return {
+        "count": len(timings),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3)
+        if timings
+        else 0.0,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(max(timings, default=0.0) * 1000, 3),
+    }
@@ -0,0 +1,93 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+RECIPES_VERSION_KEY = "recipes:version"
+RECIPES_HITS_KEY = "recipes:hits"
+RECIPES_MISSES_KEY = "recipes:misses"
+
+
+def increment(key):
+    """Увеличивает счетчик в кеше, создавая его при отсутствии."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def get_recipes_version():
+    version = cache.get(RECIPES_VERSION_KEY)
+    if version is None:
+        cache.add(RECIPES_VERSION_KEY, 1, timeout=None)
+        version = cache.get(RECIPES_VERSION_KEY, 1)
+    return version
+
+
+def bump_recipes_version():
+    """Сбрасывает все закешированные ответы по рецептам."""
+    increment(RECIPES_VERSION_KEY)
+
+
+def get_recipes_cache_stats():
+    return {
+        "version": get_recipes_version(),
+        "hits": cache.get(RECIPES_HITS_KEY, 0),
+        "misses": cache.get(RECIPES_MISSES_KEY, 0),
+    }
+
+
+def get_recipes_cache_key(request, action, kwargs):
+    """Ключ ответа по нормализованной строке запроса."""
+    params = sorted(
+        (key, sorted(value for value in values if value))
+        for key, values in request.GET.lists()
+    )
+    payload = json.dumps(
+        [request.get_host(), action, kwargs, params],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    digest = hashlib.md5(payload.encode("utf-8")).hexdigest()
+    return f"recipes:{get_recipes_version()}:{digest}"
+
+
+def get_cached_recipes_data(request, action, kwargs):
+    """Ключ и данные закешированного ответа, попадания учитываются."""
+    key = get_recipes_cache_key(request, action, kwargs)
+    data = cache.get(key)
+    if data is not None:
+        increment(RECIPES_HITS_KEY)
+    return key, data
+
+
+def cache_anonymous_response(method):
+    """Кеширует ответы анонимным пользователям до смены версии рецептов.
+
+    Ответ отмечается заголовком X-Cache: HIT или MISS.
+    """
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return method(view, request, *args, **kwargs)
+
+        key, data = get_cached_recipes_data(request, view.action, kwargs)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        increment(RECIPES_MISSES_KEY)
+        response = method(view, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
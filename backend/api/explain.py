@@ -0,0 +1,95 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import urlencode
+
+from recipe.models import Ingredient, Recipe, Tag
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+
+
+def explain(connection, sql):
+    """Полные сканирования таблиц в плане запроса.
+
+    Возвращает пары (таблица, узел плана). В PostgreSQL учитываются
+    только Seq Scan с условием отбора: полный проход без условия
+    (например, COUNT(*) по всей таблице) индекс не ускорит. SQLite
+    условие узла не сообщает, для него возвращаются все полные
+    сканирования таблиц.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0][0]["Plan"]
+            return list(walk_postgresql_plan(plan))
+        if connection.vendor == "sqlite":
+            tables = set(connection.introspection.table_names(cursor))
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [
+                (match.group(1), detail)
+                for *_, detail in cursor.fetchall()
+                for match in [SQLITE_FULL_SCAN.match(detail)]
+                if match and match.group(1) in tables
+            ]
+    raise NotImplementedError(
+        f"EXPLAIN для {connection.vendor} не поддерживается"
+    )
+
+
+def walk_postgresql_plan(node):
+    if node["Node Type"] == "Seq Scan" and "Filter" in node:
+        yield node["Relation Name"], f"Seq Scan, Filter: {node['Filter']}"
+    for child in node.get("Plans", ()):
+        yield from walk_postgresql_plan(child)
+
+
+def get_hot_urls():
+    """Адреса основных эндпоинтов чтения, включая ленту и поиск."""
+    recipe = Recipe.objects.order_by("-pub_date", "-id").first()
+    tag = Tag.objects.order_by("id").first()
+    ingredient = Ingredient.objects.order_by("id").first()
+    urls = [
+        "/api/recipes/",
+        "/api/recipes/?is_favorited=1",
+        "/api/recipes/?is_in_shopping_cart=1",
+        "/api/recipes/?ordering=-favorites_count",
+        "/api/recipes/feed/",
+        "/api/recipes/feed/?ordering=-pub_date",
+        "/api/recipes/download_shopping_cart/",
+        "/api/users/",
+        "/api/users/subscriptions/?recipes_limit=3",
+    ]
+    if recipe is not None:
+        search = urlencode({"search": recipe.name.split()[0]})
+        urls += [
+            f"/api/recipes/{recipe.id}/",
+            f"/api/recipes/?author={recipe.author_id}",
+            f"/api/recipes/?{search}",
+            f"/api/recipes/?{search}&ordering=-pub_date",
+        ]
+    if ingredient is not None:
+        name = urlencode({"name": ingredient.name[:3]})
+        urls += [
+            f"/api/ingredients/?{name}",
+            f"/api/ingredients/?{name}&fuzzy=1",
+        ]
+    if tag is not None:
+        urls.append(f"/api/recipes/?tags={tag.slug}")
+    return urls
+
+
+def explain_endpoint(client, url, allowed=(), **extra):
+    """Ответ, число SQL запросов и полные сканирования таблиц в них."""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, **extra)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    problems = [
+        (table, node)
+        for query in queries.captured_queries
+        if query["sql"].lstrip().upper().startswith("SELECT")
+        for table, node in explain(connection, query["sql"])
+        if table not in allowed
+    ]
+    return response, len(queries), problems
@@ -1,6 +1,10 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
 
 from recipe.models import Ingredient, Recipe, Tag
+from recipe.search import search_recipes
+
+from .search import is_fuzzy, search_ingredients_queryset
 
 
 class RecipeFilter(filters.FilterSet):
@@ -42,14 +46,36 @@ class RecipeFilter(filters.FilterSet):
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name="name",
-        lookup_expr="icontains",
-    )
+    name = filters.CharFilter(field_name="name", method="filter_name")
 
     class Meta:
         model = Ingredient
         fields = ("name",)
 
+    def filter_name(self, queryset, field_name, value):
+        """Сначала совпадения по началу названия, затем по вхождению."""
+        return search_ingredients_queryset(
+            queryset, value, fuzzy=is_fuzzy(self.request.query_params)
+        )
+
     def filter_ingredients(self, queryset, ingredients, name):
         return queryset.filter(name=name)
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск по названию, описанию и ингредиентам.
+
+    Без явного ?ordering= выдача сортируется по релевантности.
+    """
+
+    search_param = "search"
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "").strip()
+        if not text:
+            return queryset
+        queryset = search_recipes(queryset, text)
+        if request.query_params.get(self.ordering_param):
+            return queryset
+        return queryset.order_by("-rank", "-pub_date", "-id")
@@ -0,0 +1,170 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import measure, summarize
+from api.representations import RecipeReadSerializer
+from api.serializers import RecipeGetAuthorizedSerializer, RecipeGetSerializer
+from recipe.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from users.models import User
+
+TAGS_PER_RECIPE = 3
+INGREDIENTS_PER_RECIPE = 8
+
+
+def make_recipes(size):
+    """Рецепты в памяти с подгруженными связями, как после prefetch."""
+    tags = [
+        Tag(id=pk, name=f"Тег {pk}", color="#ff0000", slug=f"tag{pk}")
+        for pk in range(1, TAGS_PER_RECIPE + 1)
+    ]
+    ingredients = [
+        Ingredient(id=pk, name=f"ингредиент {pk}", measurement_unit="г")
+        for pk in range(1, INGREDIENTS_PER_RECIPE + 1)
+    ]
+    author = User(
+        id=1,
+        email="author@example.com",
+        username="author",
+        first_name="Имя",
+        last_name="Фамилия",
+    )
+    recipes = []
+    for pk in range(1, size + 1):
+        recipe = Recipe(
+            id=pk,
+            author=author,
+            name=f"Рецепт {pk}",
+            text="Описание рецепта " * 10,
+            cooking_time=pk % 120 + 1,
+            image=f"recipes/{pk:064x}.png",
+            image_variants={
+                "source": f"recipes/{pk:064x}.png",
+                "width": 1280,
+                "height": 960,
+                "placeholder": "data:image/webp;base64,UklGRjwAAABXRUJQ",
+                "variants": [
+                    {
+                        "width": width,
+                        "height": width * 3 // 4,
+                        "webp": f"recipes/variants/{pk:060x}{width}.webp",
+                        "jpeg": f"recipes/variants/{pk:060x}{width}.jpeg",
+                    }
+                    for width in (320, 640, 1280)
+                ],
+            },
+        )
+        recipe._prefetched_objects_cache = {
+            "recipetag_set": [
+                RecipeTag(recipe=recipe, tag=tag) for tag in tags
+            ],
+            "recipeingredient_set": [
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=pk % 500
+                )
+                for ingredient in ingredients
+            ],
+        }
+        recipe.is_favorited = pk % 2 == 0
+        recipe.is_in_shopping_cart = pk % 3 == 0
+        recipe.author_is_subscribed = True
+        recipes.append(recipe)
+    return recipes
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость и вывод RecipeReadSerializer и сериалайзеров "
+        "DRF на рецептах в памяти, без запросов к базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10, 100, 1000],
+            help="Число рецептов в ответе",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50, help="Замеров на размер"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести результат в JSON"
+        )
+
+    def handle(self, *args, **options):
+        # Ссылки на изображения строятся от хоста запроса RequestFactory
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            results = self.run_sizes(options)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['size']:>5} рецептов, {result['user']}: DRF p50 "
+                f"{result['drf']['p50_ms']} мс, быстрый p50 "
+                f"{result['fast']['p50_ms']} мс, "
+                f"в {result['speedup']} раза быстрее"
+            )
+
+    def run_sizes(self, options):
+        request = RequestFactory().get("/api/recipes/")
+        renderer = JSONRenderer()
+        context = {"request": request}
+        variants = (
+            ("anonymous", RecipeGetSerializer, False),
+            ("authorized", RecipeGetAuthorizedSerializer, True),
+        )
+
+        results = []
+        for size in options["sizes"]:
+            recipes = make_recipes(size)
+            for name, serializer_class, authorized in variants:
+
+                def drf():
+                    return renderer.render(
+                        serializer_class(
+                            recipes, many=True, context=context
+                        ).data
+                    )
+
+                def fast():
+                    return renderer.render(
+                        RecipeReadSerializer(
+                            recipes,
+                            many=True,
+                            context=context,
+                            authorized=authorized,
+                        ).data
+                    )
+
+                if drf() != fast():
+                    raise CommandError(
+                        f"JSON отличается: {name}, {size} рецептов"
+                    )
+                drf_timings = [
+                    measure(drf)[0] for _ in range(options["repeat"])
+                ]
+                fast_timings = [
+                    measure(fast)[0] for _ in range(options["repeat"])
+                ]
+                drf_summary = summarize(drf_timings)
+                fast_summary = summarize(fast_timings)
+                results.append(
+                    {
+                        "size": size,
+                        "user": name,
+                        "drf": drf_summary,
+                        "fast": fast_summary,
+                        "speedup": round(
+                            drf_summary["p50_ms"]
+                            / max(fast_summary["p50_ms"], 0.001),
+                            1,
+                        ),
+                    }
+                )
+        return results
@@ -0,0 +1,97 @@
+import csv
+import json
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import measure, summarize
+from api.search import IngredientIndex
+
+
+def scan(rows, query):
+    """Полный перебор, как icontains без индекса."""
+    query = query.casefold()
+    return [row for row in rows if query in row["name"].casefold()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет поиск ингредиентов по индексу в памяти и полным "
+        "перебором на синтетических каталогах разного размера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1000, 10000, 100000],
+            help="Размеры каталога",
+        )
+        parser.add_argument(
+            "--queries", type=int, default=200, help="Запросов на размер"
+        )
+        parser.add_argument(
+            "--fuzzy", action="store_true", help="Нечеткий режим поиска"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести результат в JSON"
+        )
+
+    def handle(self, *args, **options):
+        random_generator = random.Random(options["seed"])
+        with open(
+            settings.BASE_DIR / "data" / "ingredients.csv",
+            encoding="utf-8",
+            newline="",
+        ) as csvfile:
+            base_names = [row["name"] for row in csv.DictReader(csvfile)]
+
+        results = []
+        for size in options["sizes"]:
+            rows = tuple(
+                {
+                    "id": position,
+                    "name": base_names[position % len(base_names)]
+                    if position < len(base_names)
+                    else f"{base_names[position % len(base_names)]} "
+                    f"{position // len(base_names)}",
+                    "measurement_unit": "г",
+                }
+                for position in range(size)
+            )
+            queries = []
+            for _ in range(options["queries"]):
+                name = random_generator.choice(rows)["name"]
+                length = random_generator.randint(2, min(len(name), 6))
+                start = random_generator.choice((0, len(name) - length))
+                queries.append(name[start:start + length])
+
+            build_time, index = measure(IngredientIndex, rows)
+            index_timings = [
+                measure(index.search, query, options["fuzzy"])[0]
+                for query in queries
+            ]
+            scan_timings = [measure(scan, rows, query)[0] for query in queries]
+            results.append(
+                {
+                    "size": size,
+                    "build_ms": round(build_time * 1000, 3),
+                    "index": summarize(index_timings),
+                    "scan": summarize(scan_timings),
+                }
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['size']:>8} строк: индекс строится "
+                f"{result['build_ms']} мс, поиск p50/p95 "
+                f"{result['index']['p50_ms']}/{result['index']['p95_ms']} мс, "
+                f"перебор p50/p95 "
+                f"{result['scan']['p50_ms']}/{result['scan']['p95_ms']} мс"
+            )
@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from api.explain import explain_endpoint, get_hot_urls
+from recipe.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет запросы основных эндпоинтов и проверяет через EXPLAIN, "
+        "что таблицы читаются по индексам. Запускать на PostgreSQL с "
+        "большим объемом данных: на маленьких таблицах планировщик "
+        "выбирает полное сканирование. На SQLite без статистики "
+        "полные сканирования только выводятся. Базу можно заранее "
+        "заполнить командой generate_data или ключом --seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="username пользователя, от имени которого идут запросы",
+        )
+        parser.add_argument(
+            "--allow",
+            nargs="*",
+            default=["recipe_tag"],
+            help="Таблицы, для которых полное сканирование допустимо",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            metavar="USERS",
+            help=(
+                "Сначала создать generate_data столько пользователей с "
+                "рецептами; без ключа команда в базу не пишет"
+            ),
+        )
+
+    def seed(self, users):
+        """Заполняет базу, чтобы планировщик видел реальные объемы."""
+        call_command("generate_data", users=users, stdout=self.stdout)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def get_user(self, username):
+        if username:
+            return User.objects.get(username=username)
+        return (
+            User.objects.annotate(subscriptions=Count("subscriber"))
+            .order_by("-subscriptions", "id")
+            .first()
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"])
+        if not Recipe.objects.exists():
+            raise CommandError(
+                "В базе нет рецептов, планы запросов на ней ничего не "
+                "покажут. Заполните ее командой generate_data или "
+                "запустите с --seed 2000."
+            )
+        user = self.get_user(options["user"])
+        if user is None:
+            raise CommandError("В базе нет пользователей")
+        client = APIClient()
+        client.force_authenticate(user)
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != "*"),
+            "localhost",
+        ).lstrip(".")
+        allowed = set(options["allow"])
+        strict = connection.vendor == "postgresql"
+
+        failures = warnings = 0
+        for url in get_hot_urls():
+            response, queries, problems = explain_endpoint(
+                client, url, allowed, HTTP_HOST=host
+            )
+            if not problems:
+                status = "ok"
+            elif strict:
+                status = self.style.ERROR("FAIL")
+            else:
+                status = self.style.WARNING("WARN")
+            self.stdout.write(
+                f"{status} {url} [{response.status_code}] "
+                f"запросов: {queries}"
+            )
+            for table, node in problems:
+                self.stdout.write(f"    {table}: {node}")
+            failures += strict and bool(problems)
+            warnings += not strict and bool(problems)
+
+        if failures:
+            raise CommandError(
+                f"Полное сканирование таблиц в {failures} эндпоинтах"
+            )
+        if warnings:
+            self.stdout.write(self.style.WARNING(
+                f"Полное сканирование таблиц в {warnings} эндпоинтах, "
+                f"проверьте на PostgreSQL"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS("Все запросы используют индексы"))
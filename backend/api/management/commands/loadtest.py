@@ -0,0 +1,125 @@
+import http.client
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import summarize
+
+DEFAULT_PATHS = [
+    "/api/recipes/",
+    "/api/recipes/?tags=breakfast",
+    "/api/tags/",
+    "/api/ingredients/?name=мо",
+]
+
+
+def run_worker(target, paths, deadline, headers, position):
+    """Последовательные запросы по keep-alive соединению до дедлайна."""
+    url = urlsplit(target)
+    connection_class = (
+        http.client.HTTPSConnection
+        if url.scheme == "https"
+        else http.client.HTTPConnection
+    )
+    connection = connection_class(url.netloc, timeout=30)
+    timings = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        path = url.path.rstrip("/") + quote(
+            paths[position % len(paths)], safe="/?=&"
+        )
+        position += 1
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        timings.append(time.perf_counter() - started)
+        if response.status >= 400:
+            errors += 1
+    connection.close()
+    return timings, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест эндпоинтов чтения: пропускная способность и "
+        "перцентили задержки для одного или нескольких серверов, "
+        "например WSGI и ASGI режимов с одинаковым числом ядер."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="имя=URL сервера, можно указать несколько раз",
+        )
+        parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+        parser.add_argument(
+            "--concurrency", type=int, default=32, help="Число клиентов"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Секунд на сервер"
+        )
+        parser.add_argument(
+            "--token", help="Токен для запросов авторизованного пользователя"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести результат в JSON"
+        )
+
+    def handle(self, *args, **options):
+        headers = {"Accept": "application/json"}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+
+        results = []
+        for target in options["target"]:
+            name, separator, url = target.partition("=")
+            if not separator:
+                raise CommandError(f"Ожидается имя=URL: {target}")
+            deadline = time.perf_counter() + options["duration"]
+            with ThreadPoolExecutor(options["concurrency"]) as executor:
+                futures = [
+                    executor.submit(
+                        run_worker,
+                        url,
+                        options["paths"],
+                        deadline,
+                        headers,
+                        position,
+                    )
+                    for position in range(options["concurrency"])
+                ]
+                outcomes = [future.result() for future in futures]
+            timings = [timing for worker, _ in outcomes for timing in worker]
+            results.append(
+                {
+                    "target": name,
+                    "url": url,
+                    "requests": len(timings),
+                    "errors": sum(errors for _, errors in outcomes),
+                    "rps": round(len(timings) / options["duration"], 1),
+                    "latency": summarize(timings),
+                }
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['target']:>8}: {result['rps']} запросов/с, "
+                f"ошибок {result['errors']}, p50/p95/p99 "
+                f"{result['latency']['p50_ms']}/"
+                f"{result['latency']['p95_ms']}/"
+                f"{result['latency']['p99_ms']} мс"
+            )
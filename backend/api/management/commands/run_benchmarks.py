@@ -0,0 +1,414 @@
+import base64
+import io
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import summarize
+from api.middleware import RequestStats
+from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                           ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+def endpoint(name, path, method="get", authorized=False, body=None,
+             before=None, after=None):
+    """Описание замера эндпоинта.
+
+    before и after - (метод, путь, тело) незамеряемых запросов, которые
+    возвращают данные в исходное состояние.
+    """
+    return {
+        "name": name,
+        "path": path,
+        "method": method,
+        "authorized": authorized,
+        "body": body,
+        "before": before,
+        "after": after,
+    }
+
+
+ENDPOINTS = (
+    endpoint("recipes", "/api/recipes/"),
+    endpoint("recipes-page", "/api/recipes/?page=5"),
+    endpoint("recipes-cursor", "/api/recipes/?pagination=cursor"),
+    endpoint("recipes-filter", "/api/recipes/?tags={tag}&author={author}"),
+    endpoint("recipes-search", "/api/recipes/?search={word}"),
+    endpoint("recipe", "/api/recipes/{recipe}/"),
+    endpoint("recipes-auth", "/api/recipes/", authorized=True),
+    endpoint(
+        "recipes-favorited", "/api/recipes/?is_favorited=1", authorized=True
+    ),
+    endpoint(
+        "recipes-in-cart",
+        "/api/recipes/?is_in_shopping_cart=1",
+        authorized=True,
+    ),
+    endpoint("recipes-feed", "/api/recipes/feed/", authorized=True),
+    endpoint("recipe-auth", "/api/recipes/{recipe}/", authorized=True),
+    endpoint(
+        "shopping-cart-txt",
+        "/api/recipes/download_shopping_cart/",
+        authorized=True,
+    ),
+    endpoint(
+        "shopping-cart-csv",
+        "/api/recipes/download_shopping_cart/?format=csv",
+        authorized=True,
+    ),
+    endpoint(
+        "shopping-cart-pdf",
+        "/api/recipes/download_shopping_cart/?format=pdf",
+        authorized=True,
+    ),
+    endpoint("tags", "/api/tags/"),
+    endpoint("tag", "/api/tags/{tag_id}/"),
+    endpoint("ingredients", "/api/ingredients/"),
+    endpoint("ingredients-search", "/api/ingredients/?name={ingredient}"),
+    endpoint("ingredient", "/api/ingredients/{ingredient_id}/"),
+    endpoint("users", "/api/users/", authorized=True),
+    endpoint("user", "/api/users/{author}/", authorized=True),
+    endpoint("users-me", "/api/users/me/", authorized=True),
+    endpoint(
+        "subscriptions",
+        "/api/users/subscriptions/?recipes_limit=3",
+        authorized=True,
+    ),
+    endpoint(
+        "favorite-add",
+        "/api/recipes/{free_recipe}/favorite/",
+        method="post",
+        authorized=True,
+        after=("delete", "/api/recipes/{free_recipe}/favorite/", None),
+    ),
+    endpoint(
+        "favorite-delete",
+        "/api/recipes/{free_recipe}/favorite/",
+        method="delete",
+        authorized=True,
+        before=("post", "/api/recipes/{free_recipe}/favorite/", None),
+    ),
+    endpoint(
+        "favorite-bulk",
+        "/api/recipes/favorite/",
+        method="post",
+        authorized=True,
+        body={"recipes": "{free_recipes}"},
+        after=(
+            "delete",
+            "/api/recipes/favorite/",
+            {"recipes": "{free_recipes}"},
+        ),
+    ),
+    endpoint(
+        "shopping-cart-add",
+        "/api/recipes/{free_recipe}/shopping_cart/",
+        method="post",
+        authorized=True,
+        after=("delete", "/api/recipes/{free_recipe}/shopping_cart/", None),
+    ),
+    endpoint(
+        "subscribe",
+        "/api/users/{free_author}/subscribe/",
+        method="post",
+        authorized=True,
+        after=("delete", "/api/users/{free_author}/subscribe/", None),
+    ),
+    endpoint(
+        "recipe-create",
+        "/api/recipes/",
+        method="post",
+        authorized=True,
+        body="{new_recipe}",
+        after=("delete", "/api/recipes/{created}/", None),
+    ),
+    endpoint(
+        "recipe-update",
+        "/api/recipes/{own_recipe}/",
+        method="patch",
+        authorized=True,
+        body="{new_recipe}",
+    ),
+    endpoint(
+        "token-login",
+        "/api/auth/token/login/",
+        method="post",
+        body={"email": "{email}", "password": "password"},
+    ),
+)
+
+
+def fill(value, params):
+    """Подставляет параметры в путь или тело запроса."""
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}"):
+            key = value[1:-1]
+            if key in params:
+                return params[key]
+        return value.format(**params)
+    if isinstance(value, dict):
+        return {key: fill(item, params) for key, item in value.items()}
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет эндпоинты api/urls.py в процессе через тестовый клиент "
+        "и сохраняет пропускную способность, перцентили задержки и число "
+        "SQL запросов в JSON для сравнения между версиями."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Замеров на эндпоинт"
+        )
+        parser.add_argument(
+            "--only", nargs="+", help="Имена эндпоинтов для замера"
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Очищать кеш перед каждым запросом",
+        )
+        parser.add_argument("--output", help="Файл для JSON результата")
+        parser.add_argument(
+            "--compare", help="JSON прошлого прогона для сравнения"
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user()
+        params = self.get_params(user)
+        token = Token.objects.get_or_create(user=user)[0].key
+        clients = {
+            False: Client(raise_request_exception=False),
+            True: Client(
+                raise_request_exception=False,
+                HTTP_AUTHORIZATION=f"Token {token}",
+            ),
+        }
+        endpoints = ENDPOINTS
+        if options["only"]:
+            endpoints = [
+                spec for spec in ENDPOINTS if spec["name"] in options["only"]
+            ]
+
+        results = []
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for spec in endpoints:
+                result = self.run_endpoint(spec, clients, params, options)
+                results.append(result)
+                self.stdout.write(
+                    f"{result['name']:<20} {result['status']} "
+                    f"{result['rps']:>8} rps, p50 "
+                    f"{result['latency']['p50_ms']} мс, p95 "
+                    f"{result['latency']['p95_ms']} мс, "
+                    f"SQL {result['queries']['max']}"
+                )
+        report = {"meta": self.get_meta(options), "results": results}
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def get_user(self):
+        user = (
+            User.objects.filter(username__startswith="bench")
+            .order_by("id")
+            .first()
+        )
+        if user is None:
+            raise CommandError(
+                "Нет пользователей bench*, сначала выполните generate_data"
+            )
+        return user
+
+    def get_params(self, user):
+        recipe = Recipe.objects.order_by("-id").first()
+        own_recipe = Recipe.objects.filter(author=user).first()
+        tag = Tag.objects.order_by("id").first()
+        ingredient = Ingredient.objects.order_by("id").first()
+        if None in (recipe, own_recipe, tag, ingredient):
+            raise CommandError("Недостаточно данных, выполните generate_data")
+        free_recipes = list(
+            Recipe.objects.exclude(
+                id__in=Favorite.objects.filter(user=user).values("recipe")
+            )
+            .exclude(
+                id__in=ShoppingCart.objects.filter(user=user).values("recipe")
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[:20]
+        )
+        free_author = (
+            User.objects.exclude(id=user.id)
+            .exclude(
+                id__in=Subscription.objects.filter(user=user).values(
+                    "subscribing"
+                )
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), "#49B64E").save(buffer, "JPEG")
+        ingredient_ids = list(
+            RecipeIngredient.objects.filter(recipe=recipe).values_list(
+                "ingredient", flat=True
+            )
+        )
+        return {
+            "recipe": recipe.id,
+            "own_recipe": own_recipe.id,
+            "author": recipe.author_id,
+            "tag": tag.slug,
+            "tag_id": tag.id,
+            "word": recipe.name.split()[0].lower(),
+            "ingredient": ingredient.name[:3],
+            "ingredient_id": ingredient.id,
+            "free_recipe": free_recipes[0],
+            "free_recipes": free_recipes,
+            "free_author": free_author,
+            "email": user.email,
+            "new_recipe": {
+                "name": "Замер",
+                "text": "Рецепт для замера",
+                "cooking_time": 10,
+                "tags": [tag.id],
+                "ingredients": [
+                    {"id": ingredient_id, "amount": 10}
+                    for ingredient_id in ingredient_ids
+                ],
+                "image": "data:image/jpeg;base64,"
+                + base64.b64encode(buffer.getvalue()).decode(),
+            },
+        }
+
+    def send(self, client, method, path, body):
+        if body is None:
+            return getattr(client, method)(path)
+        return getattr(client, method)(
+            path, json.dumps(body), content_type="application/json"
+        )
+
+    def run_endpoint(self, spec, clients, params, options):
+        method, path = spec["method"], spec["path"]
+        before, after = spec["before"], spec["after"]
+        client = clients[spec["authorized"]]
+        timings = []
+        db_timings = []
+        queries = []
+        statuses = set()
+        for number in range(options["requests"] + 1):
+            if before:
+                self.send(
+                    client,
+                    before[0],
+                    fill(before[1], params),
+                    fill(before[2], params),
+                )
+            if options["cold"]:
+                cache.clear()
+            stats = RequestStats()
+            with connection.execute_wrapper(stats):
+                started = time.perf_counter()
+                response = self.send(
+                    client,
+                    method,
+                    fill(path, params),
+                    fill(spec["body"], params),
+                )
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if after:
+                if response.status_code == 201 and "id" in response.json():
+                    params["created"] = response.json()["id"]
+                self.send(
+                    client,
+                    after[0],
+                    fill(after[1], params),
+                    fill(after[2], params),
+                )
+            # Первый запрос прогревает кеши и соединение
+            if number:
+                timings.append(elapsed)
+                queries.append(stats.queries)
+                db_timings.append(stats.db_time)
+                statuses.add(response.status_code)
+        total = sum(timings)
+        return {
+            "name": spec["name"],
+            "method": method.upper(),
+            "path": path,
+            "authorized": spec["authorized"],
+            "status": ",".join(str(status) for status in sorted(statuses)),
+            "requests": len(timings),
+            "rps": round(len(timings) / total, 1) if total else 0.0,
+            "latency": summarize(timings),
+            "db_ms": round(statistics.fmean(db_timings) * 1000, 3)
+            if db_timings
+            else 0.0,
+            "queries": {
+                "min": min(queries, default=0),
+                "max": max(queries, default=0),
+                "mean": round(statistics.fmean(queries), 2)
+                if queries
+                else 0.0,
+            },
+        }
+
+    def get_meta(self, options):
+        return {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "cold": options["cold"],
+            "requests": options["requests"],
+            "settings": {
+                "SERVER_MODE": settings.SERVER_MODE,
+                "FEED_MATERIALIZED": settings.FEED_MATERIALIZED,
+                "INGREDIENT_SEARCH_BACKEND": (
+                    settings.INGREDIENT_SEARCH_BACKEND
+                ),
+            },
+            "rows": {
+                "users": User.objects.count(),
+                "recipes": Recipe.objects.count(),
+                "ingredients": Ingredient.objects.count(),
+                "favorites": Favorite.objects.count(),
+                "carts": ShoppingCart.objects.count(),
+                "subscriptions": Subscription.objects.count(),
+            },
+        }
+
+    def compare(self, path, results):
+        with open(path, encoding="utf-8") as file:
+            previous = {
+                result["name"]: result for result in json.load(file)["results"]
+            }
+        self.stdout.write("\nСравнение с прошлым прогоном (p50, SQL):")
+        for result in results:
+            old = previous.get(result["name"])
+            if old is None:
+                continue
+            old_p50 = old["latency"]["p50_ms"]
+            new_p50 = result["latency"]["p50_ms"]
+            change = (new_p50 - old_p50) / old_p50 * 100 if old_p50 else 0.0
+            self.stdout.write(
+                f"{result['name']:<20} {old_p50} -> {new_p50} мс "
+                f"({change:+.0f}%), SQL {old['queries']['max']} -> "
+                f"{result['queries']['max']}"
+            )
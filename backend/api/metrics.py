@@ -0,0 +1,217 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .cache import get_recipes_cache_stats
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RouteStats:
+    __slots__ = (
+        "requests",
+        "statuses",
+        "duration",
+        "buckets",
+        "queries",
+        "db_time",
+        "render_time",
+        "response_bytes",
+        "budget_exceeded",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = defaultdict(int)
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.response_bytes = 0
+        self.budget_exceeded = 0
+
+
+class MetricsRegistry:
+    """Метрики запросов в памяти процесса по маршрутам.
+
+    У каждого воркера gunicorn свой реестр, Prometheus опрашивает
+    их по отдельности.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(RouteStats)
+
+    def observe(self, route, method, status, duration, queries, db_time,
+                render_time, response_bytes, budget_exceeded):
+        with self.lock:
+            stats = self.routes[route, method]
+            stats.requests += 1
+            stats.statuses[status] += 1
+            stats.duration += duration
+            for position, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[position] += 1
+            stats.queries += queries
+            stats.db_time += db_time
+            stats.render_time += render_time
+            stats.response_bytes += response_bytes
+            stats.budget_exceeded += budget_exceeded
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = []
+
+            def family(name, metric_type, help_text, samples):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(samples)
+
+            def labels(route, method, **extra):
+                pairs = {"route": route, "method": method, **extra}
+                return ",".join(
+                    f'{key}="{escape(str(value))}"'
+                    for key, value in pairs.items()
+                )
+
+            family(
+                "foodgram_http_requests_total",
+                "counter",
+                "Число запросов.",
+                [
+                    f"foodgram_http_requests_total"
+                    f"{{{labels(route, method, status=status)}}} {count}"
+                    for (route, method), stats in routes
+                    for status, count in sorted(stats.statuses.items())
+                ],
+            )
+            duration_samples = []
+            for (route, method), stats in routes:
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    duration_samples.append(
+                        "foodgram_http_request_duration_seconds_bucket"
+                        f"{{{labels(route, method, le=bound)}}} {count}"
+                    )
+                duration_samples += [
+                    "foodgram_http_request_duration_seconds_bucket"
+                    f"{{{labels(route, method, le='+Inf')}}} "
+                    f"{stats.requests}",
+                    "foodgram_http_request_duration_seconds_sum"
+                    f"{{{labels(route, method)}}} {stats.duration:.6f}",
+                    "foodgram_http_request_duration_seconds_count"
+                    f"{{{labels(route, method)}}} {stats.requests}",
+                ]
+            family(
+                "foodgram_http_request_duration_seconds",
+                "histogram",
+                "Время обработки запроса.",
+                duration_samples,
+            )
+            for name, attribute, help_text in (
+                (
+                    "foodgram_db_queries_total",
+                    "queries",
+                    "Число SQL запросов.",
+                ),
+                (
+                    "foodgram_db_query_seconds_total",
+                    "db_time",
+                    "Суммарное время SQL запросов.",
+                ),
+                (
+                    "foodgram_render_seconds_total",
+                    "render_time",
+                    "Время сериализации ответа в JSON и другие форматы.",
+                ),
+                (
+                    "foodgram_response_bytes_total",
+                    "response_bytes",
+                    "Размер тел ответов.",
+                ),
+                (
+                    "foodgram_query_budget_exceeded_total",
+                    "budget_exceeded",
+                    "Запросы, превысившие бюджет SQL запросов вьюхи.",
+                ),
+            ):
+                family(
+                    name,
+                    "counter",
+                    help_text,
+                    [
+                        f"{name}{{{labels(route, method)}}} "
+                        f"{format_value(getattr(stats, attribute))}"
+                        for (route, method), stats in routes
+                    ],
+                )
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.6f}"
+    return str(value)
+
+
+def render_recipes_cache():
+    """Счетчики кеша ответов по рецептам из api.cache.
+
+    Они хранятся в CACHES: с общим кешем значения одинаковы у всех
+    воркеров, с LocMemCache - свои у каждого процесса.
+    """
+    stats = get_recipes_cache_stats()
+    lines = []
+    for name, metric_type, help_text, value in (
+        (
+            "foodgram_recipes_cache_hits_total",
+            "counter",
+            "Ответы по рецептам из кеша.",
+            stats["hits"],
+        ),
+        (
+            "foodgram_recipes_cache_misses_total",
+            "counter",
+            "Ответы по рецептам, собранные и записанные в кеш.",
+            stats["misses"],
+        ),
+        (
+            "foodgram_recipes_cache_version",
+            "gauge",
+            "Версия кеша рецептов, растет при каждом сбросе.",
+            stats["version"],
+        ),
+    ):
+        lines += [
+            f"# HELP {name} {help_text}",
+            f"# TYPE {name} {metric_type}",
+            f"{name} {value}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    """Метрики для Prometheus, доступны только с METRICS_ALLOWED_IPS."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render() + render_recipes_cache(), content_type=CONTENT_TYPE
+    )
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Счетчики текущего запроса: контекст переходит и в sync_to_async
+current_stats = ContextVar("request_stats", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Вьюха выполнила больше SQL запросов, чем ее query_budget."""
+
+
+def get_query_budget(view_func, method):
+    """Бюджет запросов вьюхи: число или словарь по действиям вьюсета."""
+    view_class = getattr(view_func, "cls", None)
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        actions = getattr(view_func, "actions", None) or {}
+        budget = budget.get(actions.get(method.lower()))
+    return budget
+
+
+class RequestStats:
+    """Счетчики одного запроса, заодно обертка выполнения SQL."""
+
+    def __init__(self):
+        self.route = "unmatched"
+        self.budget = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if (
+            self.budget is not None
+            and self.queries >= self.budget
+            and settings.QUERY_BUDGET_MODE == "raise"
+        ):
+            raise QueryBudgetExceeded(
+                f"{self.route}: больше {self.budget} запросов, "
+                f"следующий: {sql}"
+            )
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def finish_render(self, response):
+        self.render_time += time.perf_counter() - self.render_started
+
+
+def observe_query(execute, sql, params, many, context):
+    """Передает SQL запрос счетчикам текущего запроса, если они есть."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_observer(sender, connection, **kwargs):
+    # Первой в списке, чтобы execute_wrapper() снимал свои обертки, а не ее
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observe_query)
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL запросы, их время, время рендеринга и размер ответа.
+
+    Данные попадают в реестр api.metrics по имени маршрута и, если
+    включен SERVER_TIMING, в заголовок Server-Timing ответа. Если у
+    вьюхи задан query_budget и запросов больше, это пишется в лог,
+    а при QUERY_BUDGET_MODE=raise выполнение прерывается исключением.
+
+    Работает и в синхронном, и в асинхронном режиме. Потоковый ответ
+    учитывается, когда его содержимое отдано целиком: запросы при
+    формировании частей тоже считаются, а Server-Timing у него
+    содержит только время до начала отдачи.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        # Соединения открываются лениво в потоках, где выполняются вьюхи
+        connection_created.connect(install_query_observer)
+        for connection in connections.all():
+            install_query_observer(None, connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = request.request_stats = RequestStats()
+        started = time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.process_response(request, response, started)
+
+    async def __acall__(self, request):
+        stats = request.request_stats = RequestStats()
+        started = time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.process_response(request, response, started)
+
+    def process_response(self, request, response, started):
+        stats = request.request_stats
+        if settings.SERVER_TIMING:
+            self.set_server_timing(response, stats, started)
+        if response.streaming:
+            response.streaming_content = self.observe_stream(
+                request, response, response.streaming_content, started
+            )
+        else:
+            self.observe(request, response, started, len(response.content))
+        return response
+
+    def observe_stream(self, request, response, content, started):
+        """Отдает части ответа, считая их размер и запросы при их сборке."""
+        stats = request.request_stats
+        content = iter(content)
+        response_bytes = 0
+        try:
+            while True:
+                token = current_stats.set(stats)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    break
+                finally:
+                    current_stats.reset(token)
+                response_bytes += len(chunk)
+                yield chunk
+        finally:
+            self.observe(request, response, started, response_bytes)
+
+    def observe(self, request, response, started, response_bytes):
+        stats = request.request_stats
+        duration = time.perf_counter() - started
+        budget_exceeded = (
+            stats.budget is not None and stats.queries > stats.budget
+        )
+        if budget_exceeded:
+            logger.warning(
+                "%s %s: %s SQL запросов при бюджете %s",
+                request.method,
+                stats.route,
+                stats.queries,
+                stats.budget,
+            )
+        registry.observe(
+            stats.route,
+            request.method,
+            response.status_code,
+            duration,
+            stats.queries,
+            stats.db_time,
+            stats.render_time,
+            response_bytes,
+            budget_exceeded,
+        )
+
+    @staticmethod
+    def set_server_timing(response, stats, started):
+        duration = time.perf_counter() - started
+        response["Server-Timing"] = (
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} '
+            f'queries", render;dur={stats.render_time * 1000:.2f}, '
+            f"total;dur={duration * 1000:.2f}"
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = request.request_stats
+        stats.route = request.resolver_match.view_name or "unnamed"
+        stats.budget = get_query_budget(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        stats = request.request_stats
+        stats.render_started = time.perf_counter()
+        response.add_post_render_callback(stats.finish_render)
+        return response
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework import pagination
+
+
+def estimate_count(queryset):
+    """Оценка числа строк таблицы из статистики PostgreSQL.
+
+    Только для запросов без условий к таблицам больше
+    PAGINATION_ESTIMATE_COUNT_THRESHOLD строк, иначе None.
+    """
+    threshold = settings.PAGINATION_ESTIMATE_COUNT_THRESHOLD
+    query = getattr(queryset, "query", None)
+    if not threshold or query is None or query.where or query.distinct:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE relname = %s",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < threshold:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT(*) по очень большим таблицам."""
+
+    @cached_property
+    def count(self):
+        estimated = estimate_count(self.object_list)
+        if estimated is not None:
+            return estimated
+        return super().count
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """Курсорная пагинация: без COUNT(*) и OFFSET на глубоких страницах."""
+
+
+class HybridPagination(pagination.BasePagination):
+    """Постраничная пагинация с курсорным режимом по запросу.
+
+    По умолчанию ответ прежний (count/next/previous/results).
+    С ?pagination=cursor или ?cursor=... список отдается курсорами
+    по полям ordering, без count.
+    """
+
+    mode_query_param = "pagination"
+    ordering = "-id"
+
+    def get_paginator(self, request):
+        if (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or KeysetPagination.cursor_query_param in request.query_params
+        ):
+            paginator = KeysetPagination()
+            paginator.ordering = self.ordering
+            return paginator
+        return PageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *PageNumberPagination().get_schema_operation_parameters(view),
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "cursor - курсорная пагинация",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            *KeysetPagination().get_schema_operation_parameters(view),
+        ]
+
+
+class RecipePagination(HybridPagination):
+    ordering = ("-pub_date", "-id")
+
+
+class UserPagination(HybridPagination):
+    ordering = "id"
+
+
+class FeedPagination(KeysetPagination):
+    ordering = ("-pub_date", "-id")
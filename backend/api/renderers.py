@@ -1,26 +1,112 @@
-import io
+import os
+import tempfile
 
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
 from rest_framework import renderers
+from rest_framework_csv.renderers import CSVStreamingRenderer
 
-INGREDIENT_DATA_FILE_HEADERS = ["Ingredient", "amount"]
+INGREDIENT_DATA_FILE_HEADERS = ["Ingredient", "measurement_unit", "amount"]
+INGREDIENT_DATA_FIELDS = ["name", "measurement_unit", "total_amount"]
 
+PDF_FONT_NAME = "ShoppingListFont"
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_CHUNK_SIZE = 64 * 1024
 
-class TextDataRenderer(renderers.BaseRenderer):
+
+class StreamingDataRenderer(renderers.BaseRenderer):
+    """Базовый рендерер построчной выгрузки списка покупок.
+
+    Метод stream принимает итератор строк сводного списка и отдает
+    документ частями для StreamingHttpResponse. Через render проходят
+    только сообщения об ошибках, они отдаются простым текстом.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return "\n".join(
+                f"{key} {value}" for key, value in data.items()
+            ).encode("utf-8")
+        return b"".join(self.stream(data))
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class TextDataRenderer(StreamingDataRenderer):
     media_type = "text/plain"
     format = "txt"
 
-    def render(self, data, *arg, **kwargs):
-        print(self.media_type)
-        print(data)
-        text_buffer = io.StringIO()
-        text_buffer.write(
-            " ".join(header for header in INGREDIENT_DATA_FILE_HEADERS) + "\n"
+    def stream(self, rows):
+        yield (" ".join(INGREDIENT_DATA_FILE_HEADERS) + "\n").encode(
+            self.charset
         )
+        for row in rows:
+            yield (
+                f"{row['name']} ({row['measurement_unit']}) "
+                f"{row['total_amount']}\n"
+            ).encode(self.charset)
+
 
-        for ingredient, value in data.items():
-            print("ID", ingredient, value)
-            text_buffer.write(
-                "".join(str(ingredient) + " " + str(value)) + "\n"
+class CSVDataRenderer(StreamingDataRenderer, CSVStreamingRenderer):
+    header = INGREDIENT_DATA_FIELDS
+    labels = dict(zip(INGREDIENT_DATA_FIELDS, INGREDIENT_DATA_FILE_HEADERS))
+
+    def stream(self, rows):
+        return CSVStreamingRenderer.render(self, (row for row in rows))
+
+
+class PDFDataRenderer(StreamingDataRenderer):
+    """Список покупок в PDF.
+
+    Таблица ссылок PDF пишется в конец документа, поэтому файл
+    собирается во временном файле на диске и отдается кусками.
+    """
+
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    render_style = "binary"
+
+    def get_font_name(self):
+        if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT_NAME
+        if os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
             )
+            return PDF_FONT_NAME
+        return "Helvetica"
+
+    def stream(self, rows):
+        font_name = self.get_font_name()
+        with tempfile.SpooledTemporaryFile(
+            max_size=PDF_CHUNK_SIZE
+        ) as buffer:
+            pdf = canvas.Canvas(buffer, pagesize=A4)
+            width, height = A4
+            y_position = height - PDF_MARGIN
+            pdf.setFont(font_name, PDF_FONT_SIZE)
+            for row in rows:
+                if y_position < PDF_MARGIN:
+                    pdf.showPage()
+                    pdf.setFont(font_name, PDF_FONT_SIZE)
+                    y_position = height - PDF_MARGIN
+                pdf.drawString(
+                    PDF_MARGIN,
+                    y_position,
+                    f"{row['name']} ({row['measurement_unit']}) — "
+                    f"{row['total_amount']}",
+                )
+                y_position -= PDF_FONT_SIZE * 1.5
+            pdf.save()
 
-        return text_buffer.getvalue()
+            buffer.seek(0)
+            chunk = buffer.read(PDF_CHUNK_SIZE)
+            while chunk:
+                yield chunk
+                chunk = buffer.read(PDF_CHUNK_SIZE)
@@ -0,0 +1,168 @@
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Prefetch
+
+from recipe.images import IMAGE_FORMATS
+from recipe.models import (Favorite, Recipe, RecipeIngredient, RecipeTag,
+                           ShoppingCart)
+from users.models import Subscription
+
+# Имена, которые storage.url и build_absolute_uri не меняют
+PLAIN_FILE_NAME = re.compile(
+    r"(?:[\w-]+(?:\.[\w-]+)*/)*[\w-]+(?:\.[\w-]+)*", re.ASCII
+)
+
+
+def get_url_builder(storage, request):
+    """Функция, строящая ссылки на файлы хранилища.
+
+    Для FileSystemStorage абсолютный адрес MEDIA_URL вычисляется один
+    раз, и к нему приписываются простые имена файлов (хеши содержимого).
+    Прочие имена проходят через storage.url и build_absolute_uri.
+    """
+
+    def get_url(name):
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    if not isinstance(storage, FileSystemStorage):
+        return get_url
+    prefix = get_url("")
+
+    def get_plain_url(name):
+        if PLAIN_FILE_NAME.fullmatch(name):
+            return prefix + name
+        return get_url(name)
+
+    return get_plain_url
+
+
+def get_recipe_url_builder(request):
+    return get_url_builder(Recipe._meta.get_field("image").storage, request)
+
+
+def with_recipe_relations(queryset):
+    """Подгружает автора, теги и ингредиенты для RecipeReadSerializer."""
+    return queryset.select_related("author").prefetch_related(
+        Prefetch(
+            "recipetag_set",
+            queryset=RecipeTag.objects.select_related("tag"),
+        ),
+        Prefetch(
+            "recipeingredient_set",
+            queryset=RecipeIngredient.objects.select_related("ingredient"),
+        ),
+    )
+
+
+def get_image_set(image_variants, get_url):
+    """Уменьшенные копии изображения в виде srcset, None до их сборки."""
+    if not image_variants:
+        return None
+    return {
+        "width": image_variants["width"],
+        "height": image_variants["height"],
+        "placeholder": image_variants["placeholder"],
+        "srcset": {
+            image_format: ", ".join(
+                f"{get_url(variant[image_format])} {variant['width']}w"
+                for variant in image_variants["variants"]
+            )
+            for image_format in IMAGE_FORMATS
+        },
+    }
+
+
+class RecipeReadSerializer:
+    """Чтение рецептов без полей DRF.
+
+    Отдает те же данные, что RecipeGetSerializer и
+    RecipeGetAuthorizedSerializer (authorized=True), но собирает словари
+    напрямую из рецептов с подгруженными автором, тегами и
+    ингредиентами. Если аннотаций вьюсета нет, флаги проверяются
+    запросами, как в обычных сериалайзерах.
+    """
+
+    def __init__(self, instance, many=False, context=None, authorized=False):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.request = self.context.get("request")
+        self.authorized = authorized
+        self.get_url = get_recipe_url_builder(self.request)
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(recipe) for recipe in self.instance]
+        return self.to_representation(self.instance)
+
+    def get_author(self, recipe):
+        author = recipe.author
+        data = {
+            "email": author.email,
+            "id": author.id,
+            "username": author.username,
+            "first_name": author.first_name,
+            "last_name": author.last_name,
+        }
+        if self.authorized:
+            is_subscribed = getattr(recipe, "author_is_subscribed", None)
+            if is_subscribed is None:
+                is_subscribed = getattr(author, "is_subscribed", None)
+            if is_subscribed is None:
+                is_subscribed = Subscription.objects.filter(
+                    user=self.request.user, subscribing=author
+                ).exists()
+            data["is_subscribed"] = is_subscribed
+        return data
+
+    def get_flag(self, recipe, model, annotation):
+        value = getattr(recipe, annotation, None)
+        if value is not None:
+            return value
+        return model.objects.filter(
+            user=self.request.user, recipe=recipe
+        ).exists()
+
+    def to_representation(self, recipe):
+        data = {
+            "id": recipe.id,
+            "tags": [
+                {
+                    "id": link.tag.id,
+                    "name": link.tag.name,
+                    "color": link.tag.color,
+                    "slug": link.tag.slug,
+                }
+                for link in recipe.recipetag_set.all()
+            ],
+            "author": self.get_author(recipe),
+            "ingredients": [
+                {
+                    "id": link.ingredient.id,
+                    "name": link.ingredient.name,
+                    "measurement_unit": link.ingredient.measurement_unit,
+                    "amount": link.amount,
+                }
+                for link in recipe.recipeingredient_set.all()
+            ],
+        }
+        if self.authorized:
+            data["is_favorited"] = self.get_flag(
+                recipe, Favorite, "is_favorited"
+            )
+            data["is_in_shopping_cart"] = self.get_flag(
+                recipe, ShoppingCart, "is_in_shopping_cart"
+            )
+        data["name"] = recipe.name
+        data["image"] = (
+            self.get_url(recipe.image.name) if recipe.image else None
+        )
+        data["image_set"] = get_image_set(recipe.image_variants, self.get_url)
+        data["text"] = recipe.text
+        data["cooking_time"] = recipe.cooking_time
+        return data
@@ -0,0 +1,149 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+
+FUZZY_SIMILARITY_THRESHOLD = 0.3
+
+
+def is_fuzzy(query_params):
+    """Нечеткий поиск включается параметром ?fuzzy=1."""
+    return query_params.get("fuzzy", "").lower() in ("1", "true")
+
+
+def get_trigrams(text):
+    """Триграммы строки с теми же отступами, что и в pg_trgm."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Совпадения по началу названия ищутся бинарным поиском в
+    отсортированном списке, вхождения и нечеткий поиск по опечаткам
+    сужаются по биграммам и триграммам.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.names = [row["name"].casefold() for row in rows]
+        self.sorted_positions = sorted(
+            range(len(rows)), key=lambda position: self.names[position]
+        )
+        self.sorted_names = [
+            self.names[position] for position in self.sorted_positions
+        ]
+        self.sort_ranks = [0] * len(rows)
+        for rank, position in enumerate(self.sorted_positions):
+            self.sort_ranks[position] = rank
+        self.trigrams = defaultdict(set)
+        self.bigrams = defaultdict(set)
+        for position, name in enumerate(self.names):
+            for trigram in get_trigrams(name):
+                self.trigrams[trigram].add(position)
+            for i in range(len(name) - 1):
+                self.bigrams[name[i:i + 2]].add(position)
+
+    def search(self, query, fuzzy=False):
+        """Сначала совпадения по началу, затем по вхождению.
+
+        В нечетком режиме после них идут похожие названия
+        в порядке убывания сходства.
+        """
+        query = query.casefold().strip()
+        if not query:
+            return list(self.rows)
+
+        prefix_positions = []
+        start = bisect_left(self.sorted_names, query)
+        for name, position in zip(
+            self.sorted_names[start:], self.sorted_positions[start:]
+        ):
+            if not name.startswith(query):
+                break
+            prefix_positions.append(position)
+
+        found = set(prefix_positions)
+        substring_positions = [
+            position
+            for position in self.get_candidates(query)
+            if position not in found and query in self.names[position]
+        ]
+        substring_positions.sort(key=self.sort_ranks.__getitem__)
+        found.update(substring_positions)
+
+        fuzzy_positions = []
+        if fuzzy:
+            fuzzy_positions = self.get_similar(query, exclude=found)
+
+        return [
+            self.rows[position]
+            for position in (
+                prefix_positions + substring_positions + fuzzy_positions
+            )
+        ]
+
+    def get_candidates(self, query):
+        """Позиции названий, содержащих все внутренние триграммы запроса."""
+        if len(query) == 1:
+            return range(len(self.names))
+        if len(query) == 2:
+            return self.bigrams.get(query, ())
+        trigrams = sorted(
+            (
+                self.trigrams.get(query[i:i + 3], set())
+                for i in range(len(query) - 2)
+            ),
+            key=len,
+        )
+        return set.intersection(*trigrams)
+
+    def get_similar(self, query, exclude):
+        query_trigrams = get_trigrams(query)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for position in self.trigrams.get(trigram, ()):
+                shared[position] += 1
+
+        similar = []
+        for position, count in shared.items():
+            if position in exclude:
+                continue
+            similarity = count / (
+                len(query_trigrams)
+                + len(get_trigrams(self.names[position]))
+                - count
+            )
+            if similarity >= FUZZY_SIMILARITY_THRESHOLD:
+                similar.append((-similarity, self.names[position], position))
+        return [position for _, _, position in sorted(similar)]
+
+
+def search_ingredients_queryset(queryset, query, fuzzy=False):
+    """Тот же порядок выдачи на триграммном индексе PostgreSQL."""
+    condition = Q(name__icontains=query)
+    ordering = ("rank", "name")
+    if fuzzy:
+        condition |= Q(name__trigram_similar=query)
+        queryset = queryset.annotate(
+            similarity=Case(
+                When(name__icontains=query, then=Value(1.0)),
+                default=TrigramSimilarity("name", query),
+                output_field=FloatField(),
+            )
+        )
+        ordering = ("rank", "-similarity", "name")
+    return (
+        queryset.filter(condition)
+        .annotate(
+            rank=Case(
+                When(name__istartswith=query, then=Value(0)),
+                When(name__icontains=query, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by(*ordering)
+    )
@@ -1,24 +1,105 @@
 import base64
+import binascii
 import re
+import tempfile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from PIL import Image
 from rest_framework import serializers
 
 from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                            RecipeTag, ShoppingCart, Tag)
 from users.models import Subscription, User
 
+from .representations import (RecipeReadSerializer, get_image_set,
+                              get_recipe_url_builder, with_recipe_relations)
+
 
 class Base64ImageField(serializers.ImageField):
-    """Сериалайзер изображений."""
+    """Сериалайзер изображений.
+
+    Принимает data URI с base64 или обычный файл из multipart-запроса.
+    Base64 декодируется частями во временный файл, который уходит
+    на диск после FILE_UPLOAD_MAX_MEMORY_SIZE, слишком большие
+    изображения отклоняются по длине строки до декодирования.
+    Pillow читает только заголовок файла, без полного декодирования.
+    """
+
+    # Кратно 4, чтобы каждая часть декодировалась независимо
+    CHUNK_SIZE = 64 * 1024
+    ALLOWED_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+
+    default_error_messages = {
+        "too_large": "Размер изображения больше {max_size} байт.",
+        "invalid_base64": "Изображение должно быть в base64.",
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+            data = self.decode(data)
+        file = serializers.FileField.to_internal_value(self, data)
+        if file.size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail("too_large", max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        try:
+            image = Image.open(file)
+        except Exception:
+            self.fail("invalid_image")
+        width, height = image.size
+        if (
+            image.format not in self.ALLOWED_FORMATS
+            or width * height > Image.MAX_IMAGE_PIXELS
+        ):
+            self.fail("invalid_image")
+        file.image = image
+        file.content_type = Image.MIME.get(image.format)
+        file.seek(0)
+        return file
+
+    def decode(self, data):
+        start = data.find(";base64,")
+        if start == -1:
+            self.fail("invalid_base64")
+        ext = data[len("data:image/"):start]
+        start += len(";base64,")
+        length = len(data) - start
+        if length % 4:
+            self.fail("invalid_base64")
+        padding = len(data) - len(data.rstrip("=")) if length else 0
+        if length // 4 * 3 - padding > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail("too_large", max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            for position in range(start, len(data), self.CHUNK_SIZE):
+                file.write(
+                    base64.b64decode(
+                        data[position:position + self.CHUNK_SIZE],
+                        validate=True,
+                    )
+                )
+        except binascii.Error:
+            file.close()
+            self.fail("invalid_base64")
+        file.seek(0)
+        return File(file, name="temp." + ext)
+
 
-        return super().to_internal_value(data)
+class ImageSetField(serializers.ReadOnlyField):
+    """Уменьшенные копии изображения рецепта в виде srcset.
+
+    Пока копии не построены, поле равно None.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "image_variants"
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        get_url = get_recipe_url_builder(self.context.get("request"))
+        return get_image_set(value, get_url)
 
 
 class UserBasicSerializer(serializers.ModelSerializer):
@@ -54,6 +135,10 @@ class UserAuthorizedSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        """Берет аннотацию вьюсета, иначе проверяет подписку запросом."""
+        is_subscribed = getattr(obj, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
         if not self.context:
             return False
         return Subscription.objects.filter(
@@ -220,6 +305,7 @@ class RecipeGetSerializer(serializers.ModelSerializer):
 
     author = UserBasicSerializer()
     image = Base64ImageField(required=False, allow_null=True)
+    image_set = ImageSetField()
     tags = RecipeTagSerializer(source="recipetag_set", many=True)
     ingredients = RecipeIngredientsSerializer(
         source="recipeingredient_set", many=True
@@ -233,6 +319,7 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             "ingredients",
             "name",
             "image",
+            "image_set",
             "text",
             "cooking_time",
         )
@@ -258,21 +345,36 @@ class RecipeGetAuthorizedSerializer(RecipeGetSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_set",
             "text",
             "cooking_time",
         )
         model = Recipe
 
-    def __get_field_method(self, obj, model):
+    def to_representation(self, instance):
+        """Передает автору аннотацию подписки из queryset вьюсета."""
+        is_subscribed = getattr(instance, "author_is_subscribed", None)
+        if is_subscribed is not None:
+            instance.author.is_subscribed = is_subscribed
+        return super().to_representation(instance)
+
+    def __get_field_method(self, obj, model, annotation):
+        value = getattr(obj, annotation, None)
+        if value is not None:
+            return value
         return model.objects.filter(
             user=self.context["request"].user, recipe=obj
         ).exists()
 
     def get_is_favorited(self, obj):
-        return self.__get_field_method(obj=obj, model=Favorite)
+        return self.__get_field_method(
+            obj=obj, model=Favorite, annotation="is_favorited"
+        )
 
     def get_is_in_shopping_cart(self, obj):
-        return self.__get_field_method(obj=obj, model=ShoppingCart)
+        return self.__get_field_method(
+            obj=obj, model=ShoppingCart, annotation="is_in_shopping_cart"
+        )
 
 
 class RecipePostSerializer(serializers.ModelSerializer):
@@ -294,51 +396,127 @@ class RecipePostSerializer(serializers.ModelSerializer):
         model = Recipe
 
     def to_representation(self, instance):
-        """Для корректного контекста возврата при создании рецепта."""
-        request = self.context.get("request")
-        context = {"request": request}
-        return RecipeGetSerializer(instance, context=context).data
+        """Рецепт заново выбирается с автором, тегами и ингредиентами."""
+        recipe = with_recipe_relations(Recipe.objects.filter(pk=instance.pk))
+        context = {"request": self.context.get("request")}
+        return RecipeReadSerializer(recipe.get(), context=context).data
+
+    @staticmethod
+    def __in_bulk(model, ids, field, message):
+        """Проверяет существование объектов одним запросом."""
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({field: message})
+        objects = model.objects.in_bulk(ids)
+        if len(objects) != len(set(ids)):
+            raise serializers.ValidationError({field: message})
+        return ids, objects
+
+    def validate(self, data):
+        """Подменяет id тегов и ингредиентов проверенными значениями."""
+        if "tags" in data:
+            tag_ids, tags = self.__in_bulk(
+                Tag, data["tags"], "tags", "Указан несуществующий тег!"
+            )
+            data["tags"] = [tags[pk] for pk in dict.fromkeys(tag_ids)]
+        if "ingredients" in data:
+            ingredient_ids, _ = self.__in_bulk(
+                Ingredient,
+                [item["id"] for item in data["ingredients"]],
+                "ingredients",
+                "Указан несуществующий ингредиент!",
+            )
+            if len(set(ingredient_ids)) != len(ingredient_ids):
+                raise serializers.ValidationError(
+                    {"ingredients": "Ингредиенты не должны повторяться!"}
+                )
+            data["ingredients"] = {
+                pk: item.get("amount")
+                for pk, item in zip(ingredient_ids, data["ingredients"])
+            }
+        return data
 
+    @staticmethod
+    def __update_tags(recipe, tags, created=False):
+        """Удаляет снятые теги и добавляет новые."""
+        old_tag_ids = set()
+        if not created:
+            old_tag_ids.update(
+                recipe.recipetag_set.values_list("tag_id", flat=True)
+            )
+        removed_tag_ids = old_tag_ids - {tag.id for tag in tags}
+        if removed_tag_ids:
+            RecipeTag.objects.filter(
+                recipe=recipe, tag_id__in=removed_tag_ids
+            ).delete()
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag)
+            for tag in tags
+            if tag.id not in old_tag_ids
+        )
+
+    @staticmethod
+    def __update_ingredients(recipe, ingredients, created=False):
+        """Пишет только изменившиеся связи рецепта с ингредиентами."""
+        old_links = {}
+        if not created:
+            old_links.update(
+                (link.ingredient_id, link)
+                for link in recipe.recipeingredient_set.all()
+            )
+        removed_link_ids = [
+            link.id
+            for ingredient_id, link in old_links.items()
+            if ingredient_id not in ingredients
+        ]
+        changed_links = []
+        new_links = []
+        for ingredient_id, amount in ingredients.items():
+            link = old_links.get(ingredient_id)
+            if link is None:
+                new_links.append(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                )
+            elif link.amount != amount:
+                link.amount = amount
+                changed_links.append(link)
+
+        if removed_link_ids:
+            RecipeIngredient.objects.filter(id__in=removed_link_ids).delete()
+        if changed_links:
+            RecipeIngredient.objects.bulk_update(changed_links, ["amount"])
+        RecipeIngredient.objects.bulk_create(new_links)
+
+    @transaction.atomic
     def create(self, validated_data):
-        if "tags" in self.initial_data:
-            tags = validated_data.pop("tags")
-        if "ingredients" in self.initial_data:
-            ingredients = validated_data.pop("ingredients")
+        tags = validated_data.pop("tags", [])
+        ingredients = validated_data.pop("ingredients", {})
         recipe = Recipe.objects.create(**validated_data)
-        for tag in tags:
-            current_tag = Tag.objects.get(id=tag)
-            RecipeTag.objects.create(recipe=recipe, tag=current_tag)
-        for ingredient in ingredients:
-            amount = ingredient.pop("amount")
-            current_ingredient = Ingredient.objects.get(**ingredient)
-            RecipeIngredient.objects.create(
-                recipe=recipe, ingredient=current_ingredient, amount=amount
-            )
+        # У нового рецепта нет связей, читать их не нужно
+        self.__update_tags(recipe, tags, created=True)
+        self.__update_ingredients(recipe, ingredients, created=True)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop("ingredients")
-        tags = validated_data.pop("tags")
-
-        old_ingredients = RecipeIngredient.objects.filter(recipe=instance)
-        old_ingredients.delete()
-        old_tags = RecipeTag.objects.filter(recipe=instance)
-        old_tags.delete()
-
-        for tag in tags:
-            current_tag = Tag.objects.get(id=tag)
-            RecipeTag.objects.create(recipe=instance, tag=current_tag)
-        for ingredient in ingredients:
-            amount = ingredient.pop("amount")
-            current_ingredient = Ingredient.objects.get(**ingredient)
-            RecipeIngredient.objects.create(
-                recipe=instance, ingredient=current_ingredient, amount=amount
+        if "tags" in validated_data:
+            self.__update_tags(instance, validated_data.pop("tags"))
+        if "ingredients" in validated_data:
+            self.__update_ingredients(
+                instance, validated_data.pop("ingredients")
             )
 
         instance.text = validated_data.get("text", instance.text)
         instance.name = validated_data.get("name", instance.name)
-        instance.image = validated_data.get("image", instance.image)
+        if "image" in validated_data:
+            # Тот же файл получит то же имя и не будет записан повторно
+            instance.image = validated_data["image"]
         instance.cooking_time = validated_data.get(
             "cooking_time", instance.cooking_time
         )
@@ -371,6 +549,17 @@ class RecipeGetListSerializer(serializers.ModelSerializer):
         model = Recipe
 
 
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Для загрузки изображения рецепта multipart-запросом."""
+
+    image = Base64ImageField()
+
+    class Meta:
+        fields = ("id", "image")
+        read_only_fields = ("id",)
+        model = Recipe
+
+
 class RecipeSubscribeSerializer(serializers.ModelSerializer):
     """Для поля рецепты в сериалайзере подписок."""
 
@@ -394,18 +583,21 @@ class RecipeShoppingCartSerializer(serializers.ModelSerializer):
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
-    """Список подписок на авторов."""
-
-    email = serializers.SerializerMethodField(source="subscribing")
-    id = serializers.SerializerMethodField(source="subscribing")
-    username = serializers.SerializerMethodField(source="subscribing")
-    first_name = serializers.SerializerMethodField(source="subscribing")
-    last_name = serializers.SerializerMethodField(source="subscribing")
+    """Список подписок на авторов.
+
+    Автор берется из select_related, recipes_count и ограниченный
+    recipes_limit список рецептов - из аннотации и предзагрузки
+    вьюсета (limited_recipes).
+    """
+
+    email = serializers.EmailField(source="subscribing.email")
+    id = serializers.IntegerField(source="subscribing.id")
+    username = serializers.CharField(source="subscribing.username")
+    first_name = serializers.CharField(source="subscribing.first_name")
+    last_name = serializers.CharField(source="subscribing.last_name")
     is_subscribed = serializers.BooleanField(read_only=True, default=True)
-    recipes = RecipeSubscribeSerializer(
-        source="subscribing.recipes", many=True
-    )
-    recipes_count = serializers.SerializerMethodField(source="subscribing")
+    recipes = serializers.SerializerMethodField()
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         fields = (
@@ -420,22 +612,20 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
         model = Subscription
 
-    def get_email(self, obj):
-        return obj.subscribing.email
-
-    def get_id(self, obj):
-        return obj.subscribing.id
-
-    def get_username(self, obj):
-        return obj.subscribing.username
-
-    def get_first_name(self, obj):
-        return obj.subscribing.first_name
-
-    def get_last_name(self, obj):
-        return obj.subscribing.last_name
+    def get_recipes(self, obj):
+        recipes = getattr(obj.subscribing, "limited_recipes", None)
+        if recipes is None:
+            recipes = obj.subscribing.recipes.order_by("-pub_date", "-id")
+            limit = self.context.get("recipes_limit")
+            if limit is not None:
+                recipes = recipes[:limit]
+        return RecipeSubscribeSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, "recipes_count"):
+            return obj.recipes_count
         return obj.subscribing.recipes.count()
 
 
@@ -458,6 +648,26 @@ class SubscribeSerializer(serializers.ModelSerializer):
         model = Subscription
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RELATIONS_MAX_ITEMS,
+    )
+
+
+class AuthorIdsSerializer(serializers.Serializer):
+    """Список id авторов для массовой подписки и отписки."""
+
+    authors = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RELATIONS_MAX_ITEMS,
+    )
+
+
 class FavoritesSerializer(serializers.ModelSerializer):
     """Список избранных рецептов."""
 
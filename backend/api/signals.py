@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from recipe.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from users.models import User
+
+from .authentication import token_cache
+from .cache import bump_recipes_version
+from .snapshots import bump_reference_version
+
+# Поля пользователя, которые входят в ответы по рецептам
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+def invalidate_recipes_cache(sender, **kwargs):
+    transaction.on_commit(bump_recipes_version)
+
+
+def invalidate_recipes_cache_by_author(sender, instance, created, raw,
+                                       update_fields, **kwargs):
+    """Автор виден в ответах по рецептам, новый пользователь - нет.
+
+    Сохранение одного last_login при входе кеш не сбрасывает.
+    """
+    if created or raw:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    invalidate_recipes_cache(sender)
+
+
+def invalidate_reference_snapshot(sender, **kwargs):
+    transaction.on_commit(lambda: bump_reference_version(sender))
+
+
+def forget_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+def forget_user_tokens(sender, instance, **kwargs):
+    token_cache.delete_user(instance.pk)
+
+
+# Ответы по рецептам содержат теги, ингредиенты и профиль автора
+for model in (Recipe, RecipeTag, RecipeIngredient, Tag, Ingredient):
+    post_save.connect(invalidate_recipes_cache, sender=model)
+    post_delete.connect(invalidate_recipes_cache, sender=model)
+
+post_save.connect(invalidate_recipes_cache_by_author, sender=User)
+post_delete.connect(invalidate_recipes_cache, sender=User)
+
+for model in (Tag, Ingredient):
+    post_save.connect(invalidate_reference_snapshot, sender=model)
+    post_delete.connect(invalidate_reference_snapshot, sender=model)
+
+post_delete.connect(forget_token, sender=Token)
+post_save.connect(forget_user_tokens, sender=User)
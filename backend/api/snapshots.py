@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from recipe.models import ReferenceVersion
+
+Snapshot = namedtuple(
+    "Snapshot", ("version", "rows", "rows_by_id", "index")
+)
+
+
+# Метки версий, прочитанные этим процессом: label -> (когда, версия)
+_known_versions = {}
+
+
+def get_known_reference_version(model):
+    """Метка версии без запроса к БД или None, если пора ее проверить.
+
+    Метка перечитывается из БД не чаще, чем раз в
+    REFERENCE_VERSION_CHECK_INTERVAL секунд.
+    """
+    known = _known_versions.get(model._meta.label_lower)
+    if (
+        known is not None
+        and time.monotonic() - known[0]
+        < settings.REFERENCE_VERSION_CHECK_INTERVAL
+    ):
+        return known[1]
+    return None
+
+
+def get_reference_version(model):
+    """Метка версии справочника: время последнего изменения таблицы."""
+    version = get_known_reference_version(model)
+    if version is not None:
+        return version
+    label = model._meta.label_lower
+    versions = ReferenceVersion.objects.filter(label=label).values_list(
+        "version", flat=True
+    )
+    version = versions.first()
+    if version is None:
+        ReferenceVersion.objects.bulk_create(
+            [ReferenceVersion(label=label, version=time.time())],
+            ignore_conflicts=True,
+        )
+        version = versions.first()
+    _known_versions[label] = (time.monotonic(), version)
+    return version
+
+
+def bump_reference_version(model):
+    """Помечает снимки справочника устаревшими во всех процессах.
+
+    Метка хранится в БД, поэтому ее видят и воркеры сервера, и
+    команды управления. Другие процессы заметят ее не позже, чем
+    через REFERENCE_VERSION_CHECK_INTERVAL секунд.
+    """
+    label = model._meta.label_lower
+    version = time.time()
+    if not ReferenceVersion.objects.filter(label=label).update(
+        version=version
+    ):
+        ReferenceVersion.objects.bulk_create(
+            [ReferenceVersion(label=label, version=version)],
+            ignore_conflicts=True,
+        )
+    _known_versions.pop(label, None)
+
+
+class ReferenceSnapshot:
+    """Снимок небольшой справочной таблицы в памяти процесса.
+
+    Таблица перечитывается целиком, когда в БД меняется метка
+    версии справочника. Если передан index_class, по строкам
+    снимка заодно строится поисковый индекс.
+    """
+
+    def __init__(self, model, serializer_class, index_class=None):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.index_class = index_class
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get_current(self):
+        """Снимок без обращения к БД или None, если его нужно проверить."""
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and snapshot.version == get_known_reference_version(self.model)
+        ):
+            return snapshot
+        return None
+
+    def get(self):
+        snapshot = self.get_current()
+        if snapshot is not None:
+            return snapshot
+        version = get_reference_version(self.model)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                queryset = self.model.objects.order_by("id")
+                rows = tuple(self.serializer_class(queryset, many=True).data)
+                self._snapshot = Snapshot(
+                    version=version,
+                    rows=rows,
+                    rows_by_id={row["id"]: row for row in rows},
+                    index=self.index_class(rows) if self.index_class else None,
+                )
+            return self._snapshot
+
+
+def snapshot_response(request, version, data, response_class=Response):
+    """Ответ с ETag и Last-Modified, 304 на условный запрос."""
+    etag = '"{}"'.format(
+        hashlib.md5(
+            f"{version}:{request.get_full_path()}".encode("utf-8")
+        ).hexdigest()
+    )
+    last_modified = int(version)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = response_class(data)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -0,0 +1,280 @@
+from urllib.parse import urlparse
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                           RecipeTag, ShoppingCart, Tag)
+from users.models import Subscription, User
+
+from .explain import explain_endpoint, get_hot_urls
+from .snapshots import bump_reference_version
+
+
+def create_user(username):
+    return User.objects.create(
+        username=username,
+        email=f"{username}@example.com",
+        first_name="Имя",
+        last_name="Фамилия",
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    """Рецепты автора со всеми переданными тегами и ингредиентами."""
+    recipes = [
+        Recipe.objects.create(
+            author=author,
+            name=f"Суп {author.username} {number}",
+            text="Суп с морковью",
+            cooking_time=10,
+            image="recipes/test.png",
+        )
+        for number in range(count)
+    ]
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in tags
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=100)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    return recipes
+
+
+class QueryCountMixin:
+    """Данные двух размеров и проверка числа SQL запросов на обоих.
+
+    Число запросов эндпоинта чтения не должно зависеть от числа
+    рецептов, тегов, ингредиентов и подписок: иначе это N+1.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("reader")
+        cls.author = create_user("author")
+        cls.tags = [
+            Tag.objects.create(name="Завтрак", color="#E26C2D", slug="tag-0")
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name="Морковь", measurement_unit="г")
+        ]
+        cls.recipe = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients
+        )[0]
+        Subscription.objects.create(user=cls.user, subscribing=cls.author)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def grow(self, authors=5, recipes_per_author=10):
+        """Добавляет авторов, рецепты, подписки, избранное и покупки."""
+        tags = self.tags + [
+            Tag.objects.create(
+                name=f"Тег {number}", color="#49B64E", slug=f"tag-{number}"
+            )
+            for number in range(1, 6)
+        ]
+        ingredients = self.ingredients + [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(1, 20)
+        ]
+        for number in range(authors):
+            author = create_user(f"author{number}")
+            recipes = create_recipes(
+                author, recipes_per_author, tags, ingredients
+            )
+            Subscription.objects.create(user=self.user, subscribing=author)
+            Favorite.objects.bulk_create(
+                Favorite(user=self.user, recipe=recipe) for recipe in recipes
+            )
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=self.user, recipe=recipe)
+                for recipe in recipes
+            )
+
+    def reset_caches(self):
+        """Каждый замер идет мимо кеша ответов и снимков справочников."""
+        cache.clear()
+        bump_reference_version(Tag)
+        bump_reference_version(Ingredient)
+
+    def get_client(self, authorized):
+        client = APIClient()
+        if authorized:
+            client.force_authenticate(self.user)
+        return client
+
+    def assertConstantQueries(self, url, number, authorized=True):
+        client = self.get_client(authorized)
+        for size in ("small", "large"):
+            if size == "large":
+                self.grow()
+            self.reset_caches()
+            with self.subTest(url=url, size=size):
+                with self.assertNumQueries(number):
+                    response = client.get(url)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+
+
+class ReadEndpointQueriesTest(QueryCountMixin, TestCase):
+    """Число SQL запросов эндпоинтов чтения."""
+
+    def test_recipes_list(self):
+        self.assertConstantQueries("/api/recipes/", 4)
+
+    def test_recipes_list_anonymous(self):
+        self.assertConstantQueries("/api/recipes/", 4, authorized=False)
+
+    def test_recipes_list_filtered(self):
+        self.assertConstantQueries(
+            "/api/recipes/?is_favorited=1&tags=tag-0", 5
+        )
+
+    def test_recipe_detail(self):
+        self.assertConstantQueries(f"/api/recipes/{self.recipe.id}/", 3)
+
+    def test_recipe_detail_anonymous(self):
+        self.assertConstantQueries(
+            f"/api/recipes/{self.recipe.id}/", 3, authorized=False
+        )
+
+    def test_feed(self):
+        self.assertConstantQueries("/api/recipes/feed/", 3)
+
+    def test_tags(self):
+        self.assertConstantQueries("/api/tags/", 2)
+
+    def test_ingredients(self):
+        self.assertConstantQueries("/api/ingredients/", 2)
+
+    def test_ingredients_search(self):
+        self.assertConstantQueries("/api/ingredients/?name=мор", 2)
+
+    def test_users(self):
+        self.assertConstantQueries("/api/users/", 2)
+
+    def test_subscriptions(self):
+        self.assertConstantQueries(
+            "/api/users/subscriptions/?recipes_limit=3", 3
+        )
+
+
+class ShoppingListQueriesTest(QueryCountMixin, TestCase):
+    """Список покупок собирается одним запросом при любом размере."""
+
+    url = "/api/recipes/download_shopping_cart/?format={}"
+
+    def test_download_txt(self):
+        self.assertConstantQueries(self.url.format("txt"), 1)
+
+    def test_download_csv(self):
+        self.assertConstantQueries(self.url.format("csv"), 1)
+
+    def test_download_pdf(self):
+        self.assertConstantQueries(self.url.format("pdf"), 1)
+
+    def grow(self):
+        # В корзине 1 рецепт, после grow - 50
+        super().grow(authors=1, recipes_per_author=49)
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.user).count(), 50
+        )
+
+
+class RecipeCacheInvalidationTest(QueryCountMixin, TestCase):
+    """Кеш ответов по рецептам сбрасывается при правке связанных данных."""
+
+    def get_recipe(self):
+        response = self.get_client(authorized=False).get(
+            f"/api/recipes/{self.recipe.id}/"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertRefreshed(self, instance, field, value, read):
+        self.get_recipe()
+        setattr(instance, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+        self.assertEqual(read(self.get_recipe()), value)
+
+    def test_tag_change(self):
+        self.assertRefreshed(
+            self.tags[0], "name", "Ужин", lambda data: data["tags"][0]["name"]
+        )
+
+    def test_ingredient_change(self):
+        self.assertRefreshed(
+            self.ingredients[0],
+            "measurement_unit",
+            "кг",
+            lambda data: data["ingredients"][0]["measurement_unit"],
+        )
+
+    def test_author_change(self):
+        self.assertRefreshed(
+            self.author,
+            "first_name",
+            "Новое",
+            lambda data: data["author"]["first_name"],
+        )
+
+    def test_last_login_keeps_cache(self):
+        self.get_recipe()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.author.save(update_fields=["last_login"])
+        self.assertEqual(callbacks, [])
+
+
+class HotPathPlanTest(QueryCountMixin, TestCase):
+    """Запросы основных эндпоинтов читают таблицы по индексам.
+
+    В PostgreSQL последовательное сканирование запрещается, и Seq Scan
+    с условием остается в плане, только если подходящего индекса нет.
+    SQLite условия узла не сообщает: для него разрешены таблицы,
+    которые эндпоинт читает целиком.
+    """
+
+    allowed = {"recipe_tag"}
+    sqlite_full_reads = {
+        "/api/users/": {"users_user"},
+        "/api/ingredients/": {"recipe_ingredient"},
+    }
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+            self.addCleanup(self.reset_seqscan)
+
+    @staticmethod
+    def reset_seqscan():
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def get_allowed(self, url):
+        if connection.vendor != "sqlite":
+            return self.allowed
+        path = urlparse(url).path
+        return self.allowed | self.sqlite_full_reads.get(path, set())
+
+    def test_hot_paths_use_indexes(self):
+        self.grow()
+        self.reset_caches()
+        client = self.get_client(authorized=True)
+        for url in get_hot_urls():
+            with self.subTest(url=url):
+                response, _, problems = explain_endpoint(
+                    client, url, self.get_allowed(url)
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(problems, [])
@@ -3,6 +3,7 @@ from django.conf.urls.static import static
 from django.urls import include, path
 from rest_framework import routers
 
+from .async_views import make_async
 from .views import (CustomUserViewSet, FavoriteViewSet, IngredientViewSet,
                     RecipeViewSet, ShoppingCartViewSet, SubscribeViewSet,
                     TagViewSet)
@@ -29,8 +30,12 @@ router.register(
 )
 router.register("users/subscriptions", CustomUserViewSet)
 
+router_urls = router.urls
+if settings.SERVER_MODE == "asgi":
+    router_urls = make_async(router_urls)
+
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(router_urls)),
     path("auth/", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
 ]
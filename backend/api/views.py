@@ -1,31 +1,46 @@
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
-from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from recipe.feed import get_feed_entries, get_feed_filter
 from recipe.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipe.services import (add_recipe_links, get_shopping_list,
+                             get_subscriptions, remove_recipe_links, subscribe,
+                             unsubscribe)
 from users.models import Subscription, User
 
-from .filters import IngredientFilter, RecipeFilter
+from .cache import cache_anonymous_response
+from .filters import IngredientFilter, RecipeFilter, RecipeSearchFilter
+from .pagination import FeedPagination, RecipePagination, UserPagination
 from .permissions import AuthorOrReadOnly, OwnerOrAdmin, ReadOnly
-from .renderers import TextDataRenderer
-from .serializers import (FavoriteAddSerializer, FavoriteDeleteSerializer,
-                          IngredientSerializer, RecipeGetAuthorizedSerializer,
-                          RecipeGetSerializer, RecipePostSerializer,
+from .renderers import CSVDataRenderer, PDFDataRenderer, TextDataRenderer
+from .representations import RecipeReadSerializer, with_recipe_relations
+from .search import IngredientIndex, is_fuzzy
+from .serializers import (AuthorIdsSerializer, FavoriteAddSerializer,
+                          FavoriteDeleteSerializer, IngredientSerializer,
+                          RecipeGetAuthorizedSerializer, RecipeGetSerializer,
+                          RecipeIdsSerializer, RecipeImageSerializer,
+                          RecipePostSerializer, RecipeSubscribeSerializer,
                           ShoppingCartAddSerializer,
                           ShoppingCartDeleteSerializer, SignUpSerializer,
                           SubscribeSerializer, SubscriptionSerializer,
                           TagSerializer, UserAuthorizedSerializer,
                           UserBasicSerializer)
+from .snapshots import (ReferenceSnapshot, get_reference_version,
+                        snapshot_response)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -33,12 +48,103 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeGetSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
     permission_classes = (AuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
-    search_fields = ("name",)
+    filter_backends = (DjangoFilterBackend, OrderingFilter, RecipeSearchFilter)
     filterset_class = RecipeFilter
-    ordering = ("-pub_date",)
+    ordering = ("-pub_date", "-id")
+    ordering_fields = (
+        "id",
+        "name",
+        "cooking_time",
+        "pub_date",
+        "favorites_count",
+        "cart_count",
+    )
+    # Сколько SQL запросов допустимо, с учетом аутентификации
+    query_budget = {
+        "list": 7,
+        "retrieve": 5,
+        "feed": 7,
+        "download_shopping_cart": 2,
+    }
+
+    def get_queryset(self):
+        """Для чтения сразу подгружает автора, теги и ингредиенты."""
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve", "feed"):
+            return queryset
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(
+                    Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+                ),
+                is_in_shopping_cart=Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=OuterRef("pk")
+                    )
+                ),
+                author_is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, subscribing=OuterRef("author")
+                    )
+                ),
+            )
+        return with_recipe_relations(queryset)
+
+    def get_read_serializer(self, *args, **kwargs):
+        """Чтение рецептов без полей DRF, JSON тот же, что у сериалайзеров."""
+        kwargs["context"] = self.get_serializer_context()
+        kwargs["authorized"] = self.request.user.is_authenticated
+        return RecipeReadSerializer(*args, **kwargs)
+
+    @cache_anonymous_response
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            serializer = self.get_read_serializer(queryset, many=True)
+            return Response(serializer.data)
+        serializer = self.get_read_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @cache_anonymous_response
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_read_serializer(self.get_object())
+        return Response(serializer.data)
+
+    @action(
+        methods=["get"],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request, *args, **kwargs):
+        """Лента: свежие рецепты авторов из подписок пользователя."""
+        queryset = self.filter_queryset(self.get_queryset())
+        entries = None
+        if OrderingFilter.ordering_param not in request.query_params:
+            entries = get_feed_entries(request.user, queryset)
+        if entries is None:
+            page = self.paginate_queryset(
+                queryset.filter(get_feed_filter(request.user))
+            )
+        else:
+            # Страница выбирается по записям ленты, рецепты - по их id
+            entries = self.paginate_queryset(
+                entries.only("recipe_id", "pub_date")
+            )
+            recipes = self.get_queryset().in_bulk(
+                [entry.recipe_id for entry in entries]
+            )
+            page = [
+                recipes[entry.recipe_id]
+                for entry in entries
+                if entry.recipe_id in recipes
+            ]
+        serializer = self.get_read_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def get_serializer(self, *args, **kwargs):
         """Для передачи пользователя в контекст запроса."""
@@ -49,10 +155,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ("create", "partial_update"):
             return RecipePostSerializer
+        if self.action in ("favorite_bulk", "shopping_cart_bulk"):
+            return RecipeIdsSerializer
+        if self.action == "upload_image":
+            return RecipeImageSerializer
         if self.request.user == AnonymousUser():
             return RecipeGetSerializer
         return RecipeGetAuthorizedSerializer
 
+    def update_links(self, request, model, counter_field):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
+        if request.method == "DELETE":
+            remove_recipe_links(model, request.user, recipe_ids, counter_field)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        recipes = add_recipe_links(
+            model, request.user, recipe_ids, counter_field
+        )
+        return Response({"recipes": [recipe.id for recipe in recipes]})
+
+    @action(
+        methods=["post", "delete"],
+        detail=False,
+        url_path="favorite",
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_bulk(self, request, *args, **kwargs):
+        """Добавляет в избранное или удаляет из него список рецептов.
+
+        Несуществующие рецепты пропускаются, в ответе на POST - id
+        рецептов, которые теперь в избранном.
+        """
+        return self.update_links(request, Favorite, "favorites_count")
+
+    @action(
+        methods=["post", "delete"],
+        detail=False,
+        url_path="shopping_cart",
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_bulk(self, request, *args, **kwargs):
+        """Массовое добавление и удаление рецептов в списке покупок."""
+        return self.update_links(request, ShoppingCart, "cart_count")
+
+    @action(
+        methods=["put"],
+        detail=True,
+        url_path="image",
+        parser_classes=[MultiPartParser],
+    )
+    def upload_image(self, request, *args, **kwargs):
+        """Заменяет изображение рецепта файлом из multipart-запроса.
+
+        Файл передается в поле image как есть, без base64.
+        """
+        serializer = self.get_serializer(self.get_object(), data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
     def get_permissions(self):
         if self.action == "retrieve":
             return (ReadOnly(),)
@@ -88,43 +250,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=False,
         url_path="download_shopping_cart",
         permission_classes=[IsAuthenticated],
-        renderer_classes=[TextDataRenderer],
+        renderer_classes=[TextDataRenderer, CSVDataRenderer, PDFDataRenderer],
     )
     def download_shopping_cart(self, request, *args, **kwargs):
-        """Функция формирования и отдачи файла с продуктами для покупок."""
-        shopping_cart = ShoppingCart.objects.filter(user=self.request.user)
-        shopping_list = dict()
-        recipes = shopping_cart.values()
-        for recipe in recipes:
-            recipe_cart = get_object_or_404(Recipe, id=recipe["recipe_id"])
-            ingredients = recipe_cart.recipeingredient_set.all()
-            for ingr in ingredients:
-                if ingr.ingredient.name not in shopping_list:
-                    shopping_list[ingr.ingredient.name] = ingr.amount
-                else:
-                    shopping_list[ingr.ingredient.name] += ingr.amount
-
-        return Response(shopping_list, status=status.HTTP_200_OK)
-
-
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+        """Функция формирования и отдачи файла с продуктами для покупок.
+
+        Формат выбирается параметром ?format=txt|csv|pdf, строки читаются
+        курсором и отдаются клиенту по мере формирования.
+        """
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        shopping_list = get_shopping_list(self.request.user).iterator()
+        if settings.SERVER_MODE == "asgi":
+            # ASGI обработчик Django 3.2 читает поток в event loop, где
+            # запросы к БД запрещены: строки выбираются заранее
+            shopping_list = list(shopping_list)
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_list),
+            content_type=content_type,
+            status=status.HTTP_200_OK,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        return response
+
+
+class ReferenceViewSet(viewsets.ReadOnlyModelViewSet):
+    """Базовый вьюсет справочников, отдаваемых из снимка в памяти."""
+
+    permission_classes = (IsAuthenticatedOrReadOnly,)
+    pagination_class = None
+    snapshot = None
+    query_budget = {"list": 2, "retrieve": 2}
+
+    @classmethod
+    def filter_rows(cls, snapshot, query_params):
+        return snapshot.rows
+
+    @classmethod
+    def uses_snapshot(cls, query_params):
+        """Можно ли ответить на запрос списка из снимка в памяти."""
+        return True
+
+    def list(self, request, *args, **kwargs):
+        snapshot = self.snapshot.get()
+        rows = list(self.filter_rows(snapshot, request.query_params))
+        return snapshot_response(request, snapshot.version, rows)
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = self.snapshot.get()
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        row = snapshot.rows_by_id.get(int(pk)) if pk.isdigit() else None
+        if row is None:
+            raise NotFound()
+        return snapshot_response(request, snapshot.version, row)
+
+
+class TagViewSet(ReferenceViewSet):
     """Тэги рецептов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = None
+    snapshot = ReferenceSnapshot(Tag, TagSerializer)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceViewSet):
     """Ингридиенты."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    permission_classes = (IsAuthenticatedOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
-    pagination_class = None
+    snapshot = ReferenceSnapshot(
+        Ingredient, IngredientSerializer, index_class=IngredientIndex
+    )
+
+    @classmethod
+    def uses_snapshot(cls, query_params):
+        return (
+            settings.INGREDIENT_SEARCH_BACKEND != "postgres"
+            or not query_params.get("name")
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию в индексе снимка или в PostgreSQL."""
+        if self.uses_snapshot(request.query_params):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(queryset, many=True)
+        return snapshot_response(
+            request, get_reference_version(Ingredient), serializer.data
+        )
+
+    @classmethod
+    def filter_rows(cls, snapshot, query_params):
+        name = query_params.get("name")
+        if not name:
+            return snapshot.rows
+        return snapshot.index.search(name, fuzzy=is_fuzzy(query_params))
 
 
 class SubscribeViewSet(viewsets.ModelViewSet):
@@ -133,24 +359,25 @@ class SubscribeViewSet(viewsets.ModelViewSet):
     serializer_class = SubscribeSerializer
     permission_classes = (IsAuthenticated,)
     pagination_class = None
+    query_budget = {"create": 6, "delete": 5}
 
     def get_queryset(self):
         user_id = self.kwargs.get("user_id")
         user = get_object_or_404(User, id=user_id)
         return user
 
-    def perform_create(self, serializer):
-        user_id = self.kwargs.get("user_id")
-        user = get_object_or_404(User, id=user_id)
-        if self.request.user == user:
+    def create(self, request, *args, **kwargs):
+        """Подписка на автора, повторная подписка не считается ошибкой."""
+        author_id = int(self.kwargs.get("user_id"))
+        if author_id == request.user.id:
             raise ValidationError("Нельзя подписываться на себя !")
-        subscribe = Subscription.objects.filter(
-            user=self.request.user, subscribing=user
-        )
-        if subscribe.exists():
-            raise ValidationError("Подписка уже существует !")
-
-        serializer.save(user=self.request.user, subscribing=user)
+        if not subscribe(request.user, [author_id]):
+            raise NotFound()
+        subscription = Subscription.objects.select_related(
+            "user", "subscribing"
+        ).get(user=request.user, subscribing=author_id)
+        serializer = self.get_serializer(subscription)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
         methods=["delete"],
@@ -159,34 +386,35 @@ class SubscribeViewSet(viewsets.ModelViewSet):
     )
     def delete(self, request, *args, **kwargs):
         """Удаляет подписку на автора."""
-        subscribing = get_object_or_404(User, id=self.kwargs.get("user_id"))
-        subscribe = Subscription.objects.filter(
-            user=request.user, subscribing=subscribing
-        )
-        if not subscribe.exists():
-            raise ValidationError("Подписка уже удалена !")
-        subscribe.delete()
+        unsubscribe(request.user, [self.kwargs.get("user_id")])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class BaseViewSet(viewsets.ModelViewSet):
-    """Базовый вьюсет для Избранного и Списка покупок."""
+    """Базовый вьюсет для Избранного и Списка покупок.
+
+    Добавление и удаление идемпотентны: повторный запрос не меняет
+    данные и не возвращает ошибку.
+    """
 
     permission_classes = (IsAuthenticated,)
     model = "Модель объекта"
-    re_adding_message = "Сообщение о повторном добавлении объекта"
-    re_deletion_message = "Сообщение о повторном удалении объекта"
-
-    def perform_create(self, serializer):
-        recipe = get_object_or_404(Recipe, id=self.kwargs.get("recipe_id"))
-        queryset = self.model.objects.filter(
-            user=self.request.user,
-            recipe=recipe,
+    counter_field = "Счетчик объектов в рецепте"
+    query_budget = {"create": 6, "delete": 6}
+
+    def create(self, request, *args, **kwargs):
+        recipes = add_recipe_links(
+            self.model,
+            request.user,
+            [self.kwargs.get("recipe_id")],
+            self.counter_field,
         )
-        if queryset.exists():
-            raise ValidationError(self.re_adding_message)
-
-        serializer.save(user=self.request.user, recipe=recipe)
+        if not recipes:
+            raise NotFound()
+        serializer = RecipeSubscribeSerializer(
+            recipes[0], context=self.get_serializer_context()
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
         methods=["delete"],
@@ -195,11 +423,12 @@ class BaseViewSet(viewsets.ModelViewSet):
     )
     def delete(self, request, *args, **kwargs):
         """Удаление объекта."""
-        recipe = get_object_or_404(Recipe, id=self.kwargs.get("recipe_id"))
-        favorite = self.model.objects.filter(user=request.user, recipe=recipe)
-        if not favorite.exists():
-            raise ValidationError(self.re_deletion_message)
-        favorite.delete()
+        remove_recipe_links(
+            self.model,
+            request.user,
+            [self.kwargs.get("recipe_id")],
+            self.counter_field,
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -207,8 +436,7 @@ class FavoriteViewSet(BaseViewSet):
     """Добавить/удалить рецепт в избранное."""
 
     model = Favorite
-    re_adding_message = "Рецепт уже добавлен в избранное!"
-    re_deletion_message = "Рецепт уже удален !"
+    counter_field = "favorites_count"
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -220,8 +448,7 @@ class ShoppingCartViewSet(BaseViewSet):
     """Добавить/удалить рецепт в Список покупок."""
 
     model = ShoppingCart
-    re_adding_message = "Рецепт уже добавлен в список покупок!"
-    re_deletion_message = "Рецепта нет в списке покупок !"
+    counter_field = "cart_count"
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -235,13 +462,30 @@ class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserBasicSerializer
     permission_classes = [AllowAny]
-    pagination_class = PageNumberPagination
+    pagination_class = UserPagination
     ordering = ("id",)
+    query_budget = {"list": 4, "me": 3, "subscriptions": 5}
+
+    def get_queryset(self):
+        """Для авторизованных отмечает подписки одним подзапросом."""
+        queryset = super().get_queryset().order_by(*self.ordering)
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, subscribing=OuterRef("pk")
+                    )
+                )
+            )
+        return queryset
 
     def get_serializer_class(self):
         """Меняет сериалайзер при POST для создания пользователя."""
         if self.action == "create":
             return SignUpSerializer
+        if self.action == "subscribe_bulk":
+            return AuthorIdsSerializer
         if self.request.user != AnonymousUser():
             return UserAuthorizedSerializer
         return UserBasicSerializer
@@ -251,22 +495,51 @@ class CustomUserViewSet(UserViewSet):
         detail=False,
         url_path="subscriptions",
         permission_classes=[IsAuthenticated],
-        pagination_class=PageNumberPagination,
+        pagination_class=UserPagination,
     )
     def subscriptions(self, request, *args, **kwargs):
         """Подписки пользователя на авторов рецептов."""
-        subscriptions = Subscription.objects.filter(
-            user=request.user
-        ).order_by("id")
+        try:
+            recipes_limit = int(request.query_params["recipes_limit"])
+        except (KeyError, ValueError):
+            recipes_limit = None
+        else:
+            recipes_limit = max(recipes_limit, 0)
+        subscriptions = get_subscriptions(request.user, recipes_limit)
+        context = {"recipes_limit": recipes_limit}
 
         page = self.paginate_queryset(subscriptions)
         if page is not None:
-            serializer = SubscriptionSerializer(page, many=True)
+            serializer = SubscriptionSerializer(
+                page, many=True, context=context
+            )
             return self.get_paginated_response(serializer.data)
 
-        serializer = SubscriptionSerializer(subscriptions, many=True)
+        serializer = SubscriptionSerializer(
+            subscriptions, many=True, context=context
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        methods=["post", "delete"],
+        detail=False,
+        url_path="subscribe",
+        permission_classes=[IsAuthenticated],
+    )
+    def subscribe_bulk(self, request, *args, **kwargs):
+        """Подписывает на список авторов или отписывает от них.
+
+        Несуществующие авторы и сам пользователь пропускаются, в ответе
+        на POST - id авторов, на которых пользователь теперь подписан.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        author_ids = serializer.validated_data["authors"]
+        if request.method == "DELETE":
+            unsubscribe(request.user, author_ids)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({"authors": subscribe(request.user, author_ids)})
+
     @action(
         methods=["post"],
         detail=False,
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -76,6 +78,97 @@ DATABASES = {
     }
 }
 
+# sqlite - локальная база для замеров и разработки без PostgreSQL
+if os.getenv("DB_ENGINE", "postgresql") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+        }
+    }
+
+# wsgi - gunicorn с синхронными воркерами, asgi - воркеры uvicorn,
+# чтение рецептов и справочников обслуживается асинхронными вьюхами
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+# Кеш ответов по рецептам (api.cache), его версия и счетчики попаданий.
+# LocMemCache по умолчанию у каждого процесса свой: сброс версии в одном
+# воркере не виден другим, поэтому с ним gunicorn запускает один воркер
+# (gunicorn.conf.py). Для нескольких воркеров нужен общий бэкенд
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", 300))
+
+# memory - индекс в памяти процесса, postgres - триграммный индекс в БД
+INGREDIENT_SEARCH_BACKEND = os.getenv("INGREDIENT_SEARCH_BACKEND", "memory")
+
+RECIPE_SEARCH_CONFIG = os.getenv("RECIPE_SEARCH_CONFIG", "russian")
+
+# С какого размера таблицы count в пагинации берется из статистики
+# pg_class вместо COUNT(*); 0 - всегда считать точно
+PAGINATION_ESTIMATE_COUNT_THRESHOLD = int(
+    os.getenv("PAGINATION_ESTIMATE_COUNT_THRESHOLD", 1000000)
+)
+
+# Как часто процесс сверяет снимки справочников с меткой версии в БД, секунд
+REFERENCE_VERSION_CHECK_INTERVAL = float(
+    os.getenv("REFERENCE_VERSION_CHECK_INTERVAL", 2)
+)
+
+# Сколько id принимают массовые эндпоинты избранного, покупок и подписок
+BULK_RELATIONS_MAX_ITEMS = int(os.getenv("BULK_RELATIONS_MAX_ITEMS", 500))
+
+# Наибольший размер загружаемого изображения рецепта в байтах
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv("RECIPE_IMAGE_MAX_SIZE", 10 * 1024 ** 2))
+
+# Ширины уменьшенных копий изображений рецептов
+RECIPE_IMAGE_WIDTHS = [
+    int(width)
+    for width in os.getenv("RECIPE_IMAGE_WIDTHS", "320 640 1280").split()
+]
+# thread - копии строит пул потоков процесса, sync - сам запрос
+IMAGE_PROCESSING_MODE = os.getenv("IMAGE_PROCESSING_MODE", "thread")
+IMAGE_PROCESSING_WORKERS = int(os.getenv("IMAGE_PROCESSING_WORKERS", 2))
+
+# Метрики запросов по маршрутам: число и время SQL, рендеринг, размер
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "True") == "True"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "True") == "True"
+# С каких адресов доступен /metrics для Prometheus
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1 ::1").split()
+# Превышение query_budget вьюхи: log - предупреждение, raise - исключение
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+
+# Материализованная лента подписок (recipe.FeedEntry)
+FEED_MATERIALIZED = os.getenv("FEED_MATERIALIZED", "False") == "True"
+# У авторов с большим числом подписчиков лента собирается при чтении
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", 10000))
+FEED_FANOUT_BATCH_SIZE = int(os.getenv("FEED_FANOUT_BATCH_SIZE", 1000))
+# thread - раскладка нового рецепта по лентам в пуле потоков, sync - в запросе
+FEED_FANOUT_MODE = os.getenv("FEED_FANOUT_MODE", "thread")
+FEED_FANOUT_WORKERS = int(os.getenv("FEED_FANOUT_WORKERS", 1))
+# Сколько секунд кешируется список популярных авторов
+FEED_POPULAR_AUTHORS_TIMEOUT = int(
+    os.getenv("FEED_POPULAR_AUTHORS_TIMEOUT", 300)
+)
+# Сколько последних записей ленты хранится на пользователя
+FEED_MAX_ENTRIES = int(os.getenv("FEED_MAX_ENTRIES", 1000))
+
+# Пользователи, найденные по токену, кешируются в процессе на TTL секунд;
+# 0 - без кеша
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 30))
+# Basic auth проверяет пароль (PBKDF2) на каждом запросе
+API_BASIC_AUTH_ENABLED = (
+    os.getenv("API_BASIC_AUTH_ENABLED", "True") == "True"
+)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,10 +202,21 @@ STATIC_ROOT = BASE_DIR / "collected_static"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Файлы называются по хешу содержимого, одинаковые не дублируются
+DEFAULT_FILE_STORAGE = os.getenv(
+    "DEFAULT_FILE_STORAGE", "recipe.storage.ContentAddressedStorage"
+)
+# Сколько секунд после записи файл не удаляется как неиспользуемый
+MEDIA_GC_GRACE_PERIOD = int(os.getenv("MEDIA_GC_GRACE_PERIOD", 3600))
 
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
 AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
@@ -122,11 +226,17 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.PageNumberPagination",
     "PAGE_SIZE": 6,
 }
+if not API_BASIC_AUTH_ENABLED:
+    # Первый класс задает WWW-Authenticate, без него 401 станет 403
+    REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"] = [
+        "api.authentication.CachedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+    ]
 
 DJOSER = {
     "LOGIN_FIELD": "email",
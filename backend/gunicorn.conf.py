@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+
+LOCAL_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8800")
+
+# Кеш ответов по рецептам и его версия живут в CACHES: с LocMemCache у
+# каждого воркера свои копии, и запись в одном воркере не сбрасывает
+# кеш остальных. Несколько воркеров - только с общим CACHE_BACKEND
+shared_cache = os.getenv("CACHE_BACKEND", LOCAL_CACHE_BACKEND) != (
+    LOCAL_CACHE_BACKEND
+)
+workers = int(
+    os.getenv(
+        "WEB_CONCURRENCY",
+        multiprocessing.cpu_count() * 2 + 1 if shared_cache else 1,
+    )
+)
+if workers > 1 and not shared_cache:
+    raise RuntimeError(
+        f"WEB_CONCURRENCY={workers} требует общего кеша: задайте "
+        "CACHE_BACKEND (memcached, DatabaseCache, FileBasedCache)"
+    )
+
+# SERVER_MODE=asgi: воркеры uvicorn, запросы чтения рецептов и
+# справочников обслуживаются асинхронно, остальные - в пуле потоков
+if os.getenv("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "backend.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "backend.wsgi:application"
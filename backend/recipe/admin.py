@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, RecipeTag,
                      ShoppingCart, Tag)
@@ -27,13 +26,9 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ("author", "name", "tags")
     empty_value_display = "-пусто-"
 
+    @admin.display(ordering="favorites_count")
     def favorite_added(self, obj):
-        return obj.favorite_added
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(favorite_added=Count("recipes"))
-        return queryset
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
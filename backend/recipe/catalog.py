@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.db import connection, transaction
+
+from .models import Ingredient
+
+FORMATS = ("csv", "json", "jsonl")
+JSON_CHUNK_SIZE = 64 * 1024
+NAME_MAX_LENGTH = Ingredient._meta.get_field("name").max_length
+UNIT_MAX_LENGTH = Ingredient._meta.get_field(
+    "measurement_unit"
+).max_length
+
+
+class CatalogFormatError(ValueError):
+    """Файл справочника не удалось разобрать."""
+
+
+def detect_format(path):
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension == "ndjson":
+        return "jsonl"
+    if extension not in FORMATS:
+        raise CatalogFormatError(
+            f"Не удалось определить формат файла {path}, укажите --format."
+        )
+    return extension
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_jsonl(file):
+    for number, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise CatalogFormatError(f"Строка {number}: {error}")
+
+
+def read_json(file, chunk_size=JSON_CHUNK_SIZE):
+    """Элементы JSON массива по одному, файл читается кусками."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = finished = False
+    exhausted = False
+    while not finished:
+        if not exhausted:
+            chunk = file.read(chunk_size)
+            exhausted = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise CatalogFormatError("Ожидался JSON массив.")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                finished = True
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError as error:
+                if exhausted:
+                    raise CatalogFormatError(str(error))
+                # Элемент разрезан границей куска, нужно дочитать файл
+                break
+            yield item
+        if exhausted and not finished:
+            raise CatalogFormatError("JSON массив не закрыт.")
+
+
+READERS = {"csv": read_csv, "json": read_json, "jsonl": read_jsonl}
+
+
+def read_rows(file, file_format):
+    """Пары (название, единица) из файла, пустые и длинные отбрасываются."""
+    for row in READERS[file_format](file):
+        try:
+            name = (row.get("name") or "").strip()
+            unit = (row.get("measurement_unit") or "").strip()
+        except AttributeError:
+            raise CatalogFormatError(f"Ожидался объект, получено: {row!r}")
+        if (
+            name
+            and unit
+            and len(name) <= NAME_MAX_LENGTH
+            and len(unit) <= UNIT_MAX_LENGTH
+        ):
+            yield name, unit
+        else:
+            yield None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ImportStats:
+    """Прогресс загрузки: прочитано, пропущено и скорость."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.skipped = 0
+        self.created = 0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+def supports_copy():
+    return connection.vendor == "postgresql"
+
+
+def import_ingredients(rows, batch_size=5000, use_copy=False,
+                       progress=None):
+    """Добавляет в справочник ингредиенты, которых в нем еще нет.
+
+    Ключ записи - название и единица измерения, существующие записи
+    и их id не меняются, поэтому ссылки рецептов сохраняются. Строки
+    вставляются пачками с ON CONFLICT DO NOTHING, а в PostgreSQL при
+    use_copy загружаются через COPY во временную таблицу. progress
+    вызывается со статистикой после каждой пачки.
+    """
+    stats = ImportStats()
+    existing = Ingredient.objects.count()
+    with transaction.atomic():
+        if use_copy:
+            copy_ingredients(rows, batch_size, stats, progress)
+        else:
+            insert_ingredients(rows, batch_size, stats, progress)
+    stats.created = Ingredient.objects.count() - existing
+    return stats
+
+
+def split_batch(batch, stats):
+    stats.read += len(batch)
+    pairs = {pair for pair in batch if pair is not None}
+    stats.skipped += sum(pair is None for pair in batch)
+    return pairs
+
+
+def insert_ingredients(rows, batch_size, stats, progress):
+    for batch in batched(rows, batch_size):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in split_batch(batch, stats)
+            ],
+            ignore_conflicts=True,
+        )
+        if progress:
+            progress(stats)
+
+
+def copy_ingredients(rows, batch_size, stats, progress):
+    table = Ingredient._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE ingredient_import "
+            "(name text, measurement_unit text) ON COMMIT DROP"
+        )
+        for batch in batched(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(split_batch(batch, stats))
+            buffer.seek(0)
+            cursor.copy_expert(
+                "COPY ingredient_import (name, measurement_unit) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            if progress:
+                progress(stats)
+        cursor.execute(
+            f"INSERT INTO {table} (name, measurement_unit) "
+            "SELECT DISTINCT name, measurement_unit FROM ingredient_import "
+            "ON CONFLICT (name, measurement_unit) DO NOTHING"
+        )
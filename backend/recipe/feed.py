@@ -0,0 +1,221 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, Q
+
+from users.models import Subscription
+
+from .models import FeedEntry, Recipe
+
+logger = logging.getLogger(__name__)
+
+POPULAR_AUTHORS_KEY = "feed:popular_authors"
+
+_executor = None
+
+
+def is_enabled():
+    return settings.FEED_MATERIALIZED
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.FEED_FANOUT_WORKERS,
+            thread_name_prefix="recipe-feed",
+        )
+    return _executor
+
+
+def get_popular_author_ids():
+    """Все авторы, у которых подписчиков больше FEED_FANOUT_MAX_FOLLOWERS.
+
+    Считается одним GROUP BY по подпискам и хранится в кеше
+    FEED_POPULAR_AUTHORS_TIMEOUT секунд, а не на каждый запрос.
+    """
+    author_ids = cache.get(POPULAR_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = set(
+            Subscription.objects.order_by()
+            .values("subscribing")
+            .annotate(followers=Count("id"))
+            .filter(followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+            .values_list("subscribing", flat=True)
+        )
+        cache.set(
+            POPULAR_AUTHORS_KEY,
+            author_ids,
+            settings.FEED_POPULAR_AUTHORS_TIMEOUT,
+        )
+    return author_ids
+
+
+def get_popular_authors(author_ids):
+    """Авторы, чьи рецепты не раскладываются по лентам подписчиков."""
+    return set(author_ids) & get_popular_author_ids()
+
+
+def get_followed_popular_authors(user):
+    """Популярные авторы из подписок пользователя, обычно без запроса."""
+    popular_ids = get_popular_author_ids()
+    if not popular_ids:
+        return set()
+    return set(
+        Subscription.objects.filter(
+            user=user, subscribing__in=popular_ids
+        ).values_list("subscribing", flat=True)
+    )
+
+
+def create_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_recipe(recipe_id):
+    """Добавляет рецепт в ленты подписчиков автора пачками."""
+    recipe = (
+        Recipe.objects.filter(id=recipe_id)
+        .only("id", "author_id", "pub_date")
+        .first()
+    )
+    if recipe is None or get_popular_authors([recipe.author_id]):
+        return 0
+    follower_ids = (
+        Subscription.objects.filter(subscribing=recipe.author_id)
+        .order_by("user")
+        .values_list("user", flat=True)
+    )
+    batch = []
+    total = 0
+    for user_id in follower_ids.iterator():
+        batch.append(
+            FeedEntry(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+        )
+        if len(batch) == settings.FEED_FANOUT_BATCH_SIZE:
+            create_entries(batch)
+            total += len(batch)
+            batch = []
+    create_entries(batch)
+    return total + len(batch)
+
+
+def fan_out_in_background(recipe_id):
+    close_old_connections()
+    try:
+        fan_out_recipe(recipe_id)
+    except Exception:
+        logger.exception("Не удалось разложить рецепт %s по лентам", recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_fan_out(recipe_id):
+    """Ставит раскладку рецепта по лентам в очередь после фиксации.
+
+    По умолчанию ее выполняет пул потоков процесса, а не запрос,
+    в режиме sync - сам запрос. Записи вставляются пачками по
+    FEED_FANOUT_BATCH_SIZE, не больше FEED_FANOUT_MAX_FOLLOWERS.
+    """
+    if settings.FEED_FANOUT_MODE == "sync":
+        transaction.on_commit(lambda: fan_out_recipe(recipe_id))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(fan_out_in_background, recipe_id)
+        )
+
+
+def fan_out_recipes(recipe_ids):
+    """Раскладывает пачку рецептов по лентам подписчиков их авторов."""
+    recipes = defaultdict(list)
+    for recipe_id, author_id, pub_date in Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list("id", "author_id", "pub_date"):
+        recipes[author_id].append((recipe_id, pub_date))
+    for author_id in get_popular_authors(list(recipes)):
+        del recipes[author_id]
+    followers = (
+        Subscription.objects.filter(subscribing__in=list(recipes))
+        .order_by("user")
+        .values_list("user", "subscribing")
+    )
+    batch = []
+    total = 0
+    for user_id, author_id in followers.iterator():
+        for recipe_id, pub_date in recipes[author_id]:
+            batch.append(
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+                )
+            )
+        if len(batch) >= settings.FEED_FANOUT_BATCH_SIZE:
+            create_entries(batch)
+            total += len(batch)
+            batch = []
+    create_entries(batch)
+    return total + len(batch)
+
+
+def add_author(user_id, author_ids):
+    """Заполняет ленту последними рецептами авторов из подписки."""
+    author_ids = set(author_ids) - get_popular_authors(author_ids)
+    if not author_ids:
+        return 0
+    recipes = (
+        Recipe.objects.filter(author__in=author_ids)
+        .order_by("-pub_date", "-id")
+        .values_list("id", "pub_date")[: settings.FEED_MAX_ENTRIES]
+    )
+    entries = [
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    ]
+    create_entries(entries)
+    return len(entries)
+
+
+def remove_author(user_id, author_id):
+    FeedEntry.objects.filter(
+        user=user_id, recipe__author=author_id
+    ).delete()
+
+
+def get_feed_entries(user, recipes):
+    """Записи FeedEntry ленты или None, если ее нужно собрать из рецептов.
+
+    Записи читаются по индексу (user, -pub_date), условия фильтров
+    из recipes применяются подзапросом. None - лента не
+    материализована или в подписках есть популярные авторы, чьи
+    рецепты в FeedEntry не попадают.
+    """
+    if not is_enabled() or get_followed_popular_authors(user):
+        return None
+    entries = FeedEntry.objects.filter(user=user)
+    if recipes.query.where:
+        entries = entries.filter(recipe__in=recipes.values("id"))
+    return entries
+
+
+def get_feed_filter(user):
+    """Условие отбора рецептов ленты пользователя.
+
+    Без материализации - join подписок и рецептов. С ней - записи
+    FeedEntry пользователя плюс рецепты популярных авторов, которые
+    читаются напрямую (fan-out on read).
+    """
+    if not is_enabled():
+        return Q(author__subscribing__user=user)
+    popular_authors = get_followed_popular_authors(user)
+    if not popular_authors:
+        return Q(feed_entries__user=user)
+    return Q(
+        id__in=FeedEntry.objects.filter(user=user).values("recipe")
+    ) | Q(author__in=popular_authors)
@@ -0,0 +1,194 @@
+import base64
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "recipes/variants"
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+PLACEHOLDER_WIDTH = 16
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix="recipe-images",
+        )
+    return _executor
+
+
+def encode(image, image_format):
+    pil_format, options = IMAGE_FORMATS[image_format]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def make_placeholder(image):
+    """Крошечная размытая копия для показа до загрузки картинки."""
+    placeholder = image.copy()
+    placeholder.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+    placeholder = placeholder.filter(ImageFilter.GaussianBlur(1))
+    # WebP почти без заголовка: около 50 байт против 600 у JPEG
+    data = base64.b64encode(encode(placeholder, "webp")).decode("ascii")
+    return f"data:image/webp;base64,{data}"
+
+
+def get_variant_names(image_variants):
+    return [
+        variant[image_format]
+        for variant in image_variants.get("variants", ())
+        for image_format in IMAGE_FORMATS
+        if variant.get(image_format)
+    ]
+
+
+def is_recently_used(storage, name, grace_period=None):
+    """Файл записан или переиспользован меньше grace_period секунд назад.
+
+    Такой файл может принадлежать еще не зафиксированной транзакции.
+    По умолчанию берется MEDIA_GC_GRACE_PERIOD.
+    """
+    if grace_period is None:
+        grace_period = settings.MEDIA_GC_GRACE_PERIOD
+    try:
+        modified = storage.get_modified_time(name)
+    except (FileNotFoundError, NotImplementedError):
+        return False
+    return timezone.now() - modified < timedelta(seconds=grace_period)
+
+
+def delete_files(storage, names):
+    for name in names:
+        if not is_recently_used(storage, name):
+            storage.delete(name)
+
+
+def delete_variants(storage, image_variants):
+    """Удаляет копии, если их исходник не используется рецептами.
+
+    Файлы называются по содержимому, поэтому у рецептов с одинаковым
+    изображением копии общие.
+    """
+    source = image_variants.get("source")
+    in_use = Recipe.objects.filter(image_variants__source=source)
+    if source and in_use.exists():
+        return
+    delete_files(storage, get_variant_names(image_variants))
+
+
+def release_image(storage, name):
+    """Удаляет изображение, на которое больше не ссылаются рецепты."""
+    if name and not Recipe.objects.filter(image=name).exists():
+        delete_files(storage, [name])
+
+
+def build_variants(recipe_id):
+    """Строит уменьшенные WebP/JPEG копии изображения рецепта.
+
+    Ширины берутся из RECIPE_IMAGE_WIDTHS, но не больше исходной.
+    Результат сохраняется в Recipe.image_variants, если за время
+    обработки изображение рецепта не сменилось.
+    """
+    recipe = (
+        Recipe.objects.filter(id=recipe_id)
+        .only("id", "image", "image_variants")
+        .first()
+    )
+    if recipe is None or not recipe.image:
+        return None
+    storage = recipe.image.storage
+    source = recipe.image.name
+    with storage.open(source) as image_file:
+        image = ImageOps.exif_transpose(Image.open(image_file))
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    stem = PurePosixPath(source).stem
+    variants = []
+    for width in sorted(
+        {min(width, image.width) for width in settings.RECIPE_IMAGE_WIDTHS}
+    ):
+        resized = image
+        if width < image.width:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        variant = {"width": resized.width, "height": resized.height}
+        for image_format in IMAGE_FORMATS:
+            variant[image_format] = storage.save(
+                f"{VARIANTS_DIR}/{stem}_{width}.{image_format}",
+                ContentFile(encode(resized, image_format)),
+            )
+        variants.append(variant)
+    image_variants = {
+        "source": source,
+        "width": image.width,
+        "height": image.height,
+        "placeholder": make_placeholder(image),
+        "variants": variants,
+    }
+
+    with transaction.atomic():
+        current = (
+            Recipe.objects.select_for_update()
+            .filter(id=recipe_id)
+            .only("id", "image", "image_variants")
+            .first()
+        )
+        if current is None or current.image.name != source:
+            delete_variants(storage, image_variants)
+            return None
+        previous = current.image_variants
+        current.image_variants = image_variants
+        current.save(update_fields=["image_variants"])
+    delete_variants(storage, previous)
+    return image_variants
+
+
+def process_in_background(recipe_id):
+    close_old_connections()
+    try:
+        build_variants(recipe_id)
+    except Exception:
+        logger.exception(
+            "Не удалось обработать изображение рецепта %s", recipe_id
+        )
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe_id):
+    """Ставит обработку изображения в очередь после фиксации транзакции.
+
+    По умолчанию копии строит пул потоков процесса, в режиме sync -
+    сам запрос (для отладки и команд).
+    """
+    if settings.IMAGE_PROCESSING_MODE == "sync":
+        transaction.on_commit(lambda: build_variants(recipe_id))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(process_in_background, recipe_id)
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from recipe.feed import add_author
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = "Заполняет ленты подписок по существующим подпискам."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="id пользователя, можно указать несколько раз",
+        )
+
+    def handle(self, *args, **options):
+        subscriptions = Subscription.objects.order_by("user", "subscribing")
+        if options["users"]:
+            subscriptions = subscriptions.filter(user__in=options["users"])
+        current_user = None
+        author_ids = []
+        total = 0
+        for user_id, author_id in subscriptions.values_list(
+            "user", "subscribing"
+        ).iterator():
+            if user_id != current_user and author_ids:
+                total += add_author(current_user, author_ids)
+                author_ids = []
+            current_user = user_id
+            author_ids.append(author_id)
+        if author_ids:
+            total += add_author(current_user, author_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"В ленты добавлено записей: {total}"
+        ))
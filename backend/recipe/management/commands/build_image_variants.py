@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipe.images import build_variants
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Строит уменьшенные копии изображений рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Перестроить копии и у рецептов, где они уже есть",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image="").order_by("id")
+        if not options["all"]:
+            recipes = recipes.filter(image_variants={})
+        built = 0
+        for recipe_id in recipes.values_list("id", flat=True).iterator():
+            if build_variants(recipe_id) is not None:
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Копии изображений построены для {built} рецептов"
+        ))
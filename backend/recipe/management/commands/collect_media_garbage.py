@@ -0,0 +1,62 @@
+import posixpath
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipe.images import get_variant_names, is_recently_used
+from recipe.models import Recipe
+
+
+def walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from walk(storage, posixpath.join(directory, subdirectory))
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет изображения рецептов и их копии, на которые не ссылается "
+        "ни один рецепт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=settings.MEDIA_GC_GRACE_PERIOD,
+            help="Не трогать файлы моложе стольких секунд",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            help="Только показать, что будет удалено",
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field("image").storage
+        directory = Recipe._meta.get_field("image").upload_to.rstrip("/")
+        if not storage.exists(directory):
+            return
+        referenced = set()
+        for name, image_variants in Recipe.objects.values_list(
+            "image", "image_variants"
+        ).iterator():
+            referenced.add(name)
+            referenced.update(get_variant_names(image_variants))
+
+        deleted = 0
+        for name in walk(storage, directory):
+            if name in referenced or is_recently_used(
+                storage, name, options["grace"]
+            ):
+                continue
+            if options["dry_run"]:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+            deleted += 1
+        verb = "К удалению" if options["dry_run"] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{verb} файлов: {deleted}"))
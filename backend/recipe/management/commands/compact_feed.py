@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Exists, OuterRef
+
+from recipe.models import FeedEntry
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из лент записи отписанных авторов и записи сверх "
+        "FEED_MAX_ENTRIES на пользователя."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-entries",
+            type=int,
+            default=settings.FEED_MAX_ENTRIES,
+            dest="max_entries",
+            help="Сколько последних записей оставить каждому пользователю",
+        )
+
+    def handle(self, *args, **options):
+        orphaned, _ = FeedEntry.objects.filter(
+            ~Exists(
+                Subscription.objects.filter(
+                    user=OuterRef("user"),
+                    subscribing=OuterRef("recipe__author"),
+                )
+            )
+        ).delete()
+
+        max_entries = options["max_entries"]
+        overflowing = (
+            FeedEntry.objects.values("user")
+            .annotate(entries=Count("id"))
+            .filter(entries__gt=max_entries)
+            .values_list("user", flat=True)
+        )
+        trimmed = 0
+        for user_id in overflowing.iterator():
+            user_entries = FeedEntry.objects.filter(user=user_id)
+            kept_ids = list(
+                user_entries.order_by("-pub_date", "-id").values_list(
+                    "id", flat=True
+                )[:max_entries]
+            )
+            deleted, _ = user_entries.exclude(id__in=kept_ids).delete()
+            trimmed += deleted
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено записей: отписки - {orphaned}, сверх лимита - {trimmed}"
+        ))
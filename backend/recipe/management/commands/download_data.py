@@ -1,7 +1,8 @@
-import csv
-
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.snapshots import bump_reference_version
+from recipe.catalog import (FORMATS, CatalogFormatError, detect_format,
+                            import_ingredients, read_rows, supports_copy)
 from recipe.models import Ingredient
 
 OBJECTS_LIST = {
@@ -12,44 +13,80 @@ OBJECTS_LIST = {
 def clear_data(self):
     for key, value in OBJECTS_LIST.items():
         value.objects.all().delete()
+        bump_reference_version(value)
         self.stdout.write(
             self.style.WARNING(f'Существующие записи "{key}" были удалены.')
         )
 
 
 class Command(BaseCommand):
-    help = "Загружает CSV данные из файла data/ingredients."
+    help = (
+        "Загружает ингредиенты из CSV, JSON или JSONL файла, по умолчанию "
+        "data/ingredients.csv. Уже существующие ингредиенты не меняются."
+    )
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="./data/ingredients.csv"
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            dest="file_format",
+            help="Формат файла, по умолчанию определяется по расширению",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, dest="batch_size"
+        )
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="Загрузка через COPY, только для PostgreSQL",
+        )
         # Аргумент для удаления всех имеющихся в БД данных
         parser.add_argument(
             "--delete-existing",
             action="store_true",
             dest="delete_existing",
             default=False,
-            help="Удаляет существующие данные, записанные ранее",
+            help=(
+                "Удаляет существующие данные, записанные ранее, вместе "
+                "с ингредиентами рецептов"
+            ),
         )
 
     def handle(self, *args, **options):
         """Загрузка Ингредиентов."""
+        if options["copy"] and not supports_copy():
+            raise CommandError("--copy доступен только для PostgreSQL.")
+        try:
+            file_format = options["file_format"] or detect_format(
+                options["path"]
+            )
+        except CatalogFormatError as error:
+            raise CommandError(error)
 
         if options["delete_existing"]:
             clear_data(self)
 
-        records = []
-        with open(
-                "./data/ingredients.csv",
-                encoding="utf-8",
-                newline=""
-        ) as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                record = Ingredient(
-                    name=row["name"], measurement_unit=row["measurement_unit"]
+        try:
+            with open(options["path"], encoding="utf-8", newline="") as file:
+                stats = import_ingredients(
+                    read_rows(file, file_format),
+                    batch_size=options["batch_size"],
+                    use_copy=options["copy"],
+                    progress=self.report,
                 )
-                records.append(record)
-
-        Ingredient.objects.bulk_create(records)
+        except (OSError, CatalogFormatError) as error:
+            raise CommandError(error)
+        bump_reference_version(Ingredient)
         self.stdout.write(self.style.SUCCESS(
-            'Все записи "Ингредиентов" сохранены'
+            f"Прочитано строк: {stats.read}, добавлено ингредиентов: "
+            f"{stats.created}, пропущено строк: {stats.skipped} "
+            f"за {stats.elapsed:.1f} с ({stats.rate:.0f} строк/с)"
         ))
+
+    def report(self, stats):
+        self.stdout.write(
+            f"Прочитано {stats.read} строк, {stats.rate:.0f} строк/с"
+        )
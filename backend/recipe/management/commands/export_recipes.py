@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.models import Recipe
+from recipe.transfer import (export_chunks, filter_recipes, parse_moment,
+                             read_checkpoint, write_checkpoint)
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает рецепты с авторами, тегами, ингредиентами и именами "
+        "изображений в NDJSON, по рецепту в строке."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default="-", help="Файл выгрузки, по умолчанию stdout"
+        )
+        parser.add_argument(
+            "--author",
+            action="append",
+            dest="authors",
+            help="username автора, можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--since", type=parse_moment, help="Опубликованные с этой даты"
+        )
+        parser.add_argument(
+            "--until", type=parse_moment, help="Опубликованные до этой даты"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, dest="chunk_size"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Файл с id последнего выгруженного рецепта, при повторном "
+                "запуске выгрузка продолжается с него"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        if checkpoint and options["output"] == "-":
+            raise CommandError("Для --checkpoint нужен --output.")
+        after_id = read_checkpoint(checkpoint).get("last_id", 0)
+        recipes = filter_recipes(
+            Recipe.objects.all(),
+            options["authors"],
+            options["since"],
+            options["until"],
+        )
+
+        if options["output"] == "-":
+            output = sys.stdout
+        else:
+            output = open(
+                options["output"], "a" if after_id else "w", encoding="utf-8"
+            )
+        total = 0
+        try:
+            for chunk in export_chunks(
+                recipes, options["chunk_size"], after_id
+            ):
+                output.writelines(
+                    json.dumps(record, ensure_ascii=False) + "\n"
+                    for record in chunk
+                )
+                total += len(chunk)
+                if checkpoint:
+                    output.flush()
+                    os.fsync(output.fileno())
+                    write_checkpoint(checkpoint, {"last_id": chunk[-1]["id"]})
+                self.stderr.write(f"Выгружено рецептов: {total}")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f"Выгрузка завершена, рецептов: {total}"
+        ))
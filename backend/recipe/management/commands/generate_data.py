@@ -0,0 +1,256 @@
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from api.cache import bump_recipes_version
+from api.snapshots import bump_reference_version
+from recipe import feed
+from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                           RecipeTag, ShoppingCart, Tag)
+from recipe.search import update_search_index
+from recipe.services import recount_recipe_counters
+from users.models import Subscription, User
+
+WORDS = (
+    "суп салат пирог каша рагу запеканка омлет борщ плов паста котлеты "
+    "блины морковью грибами курицей сыром овощами рисом яблоками творогом"
+).split()
+COLORS = ("#E26C2D", "#49B64E", "#8775D2", "#F9A62B", "#2D9CDB")
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими пользователями, рецептами, "
+        "избранным, списками покупок и подписками для нагрузочных тестов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument(
+            "--recipes-per-author",
+            type=int,
+            default=5,
+            dest="recipes_per_author",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            type=int,
+            default=6,
+            dest="ingredients_per_recipe",
+        )
+        parser.add_argument(
+            "--tags", type=int, default=5, help="Сколько тегов должно быть"
+        )
+        parser.add_argument(
+            "--favorites", type=int, default=10, help="Избранных на человека"
+        )
+        parser.add_argument(
+            "--carts", type=int, default=3, help="Рецептов в списке покупок"
+        )
+        parser.add_argument(
+            "--subscriptions", type=int, default=5, help="Подписок на человека"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, dest="batch_size"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        tag_ids = self.ensure_tags(options["tags"])
+        ingredient_ids = self.ensure_ingredients(
+            options["ingredients_per_recipe"]
+        )
+        user_ids = self.create_users(options["users"])
+        recipe_ids = self.create_recipes(
+            user_ids,
+            options["recipes_per_author"],
+            tag_ids,
+            ingredient_ids,
+            options["ingredients_per_recipe"],
+        )
+        self.create_links(Favorite, user_ids, recipe_ids, options["favorites"])
+        self.create_links(ShoppingCart, user_ids, recipe_ids, options["carts"])
+        self.create_subscriptions(user_ids, options["subscriptions"])
+
+        self.stdout.write("Пересчет счетчиков и поискового индекса")
+        for start in range(0, len(recipe_ids), self.batch_size):
+            batch = recipe_ids[start:start + self.batch_size]
+            recount_recipe_counters(batch)
+            update_search_index(batch)
+        if feed.is_enabled():
+            call_command("backfill_feed", users=user_ids, stdout=self.stdout)
+        bump_recipes_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: пользователей - {len(user_ids)}, "
+            f"рецептов - {len(recipe_ids)}"
+        ))
+
+    def bulk_create(self, model, objects):
+        for start in range(0, len(objects), self.batch_size):
+            model.objects.bulk_create(
+                objects[start:start + self.batch_size],
+                ignore_conflicts=True,
+            )
+
+    def ensure_tags(self, count):
+        existing = Tag.objects.count()
+        if existing < count:
+            Tag.objects.bulk_create(
+                [
+                    Tag(
+                        name=f"Тег {number}",
+                        color=COLORS[number % len(COLORS)],
+                        slug=f"tag-{number}",
+                    )
+                    for number in range(existing + 1, count + 1)
+                ],
+                ignore_conflicts=True,
+            )
+            bump_reference_version(Tag)
+        return list(Tag.objects.order_by("id").values_list("id", flat=True))
+
+    def ensure_ingredients(self, per_recipe):
+        """Дополняет справочник, если ингредиентов меньше, чем нужно."""
+        needed = max(per_recipe * 10, 100)
+        existing = Ingredient.objects.count()
+        if existing < needed:
+            self.bulk_create(
+                Ingredient,
+                [
+                    Ingredient(
+                        name=f"ингредиент {number}", measurement_unit="г"
+                    )
+                    for number in range(existing + 1, needed + 1)
+                ],
+            )
+            bump_reference_version(Ingredient)
+        return list(
+            Ingredient.objects.order_by("id").values_list("id", flat=True)
+        )
+
+    def create_users(self, count):
+        offset = User.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first() or 0
+        # Хеш пароля считается один раз: это самая медленная часть
+        password = make_password("password")
+        usernames = [
+            f"bench{offset + number}" for number in range(1, count + 1)
+        ]
+        self.bulk_create(
+            User,
+            [
+                User(
+                    username=username,
+                    email=f"{username}@example.com",
+                    first_name=self.random.choice(("Анна", "Иван", "Олег")),
+                    last_name=self.random.choice(("Петрова", "Смирнов")),
+                    password=password,
+                )
+                for username in usernames
+            ],
+        )
+        self.stdout.write(f"Пользователей: {count}")
+        return list(
+            User.objects.filter(id__gt=offset, username__startswith="bench")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def create_image(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), "#E26C2D").save(buffer, "JPEG")
+        field = Recipe._meta.get_field("image")
+        return field.storage.save(
+            field.generate_filename(None, "generated.jpg"),
+            ContentFile(buffer.getvalue()),
+        )
+
+    def create_recipes(self, author_ids, per_author, tag_ids, ingredient_ids,
+                       ingredients_per_recipe):
+        image = self.create_image()
+        max_tags = min(3, len(tag_ids))
+        recipe_ids = []
+        authors_per_batch = max(self.batch_size // max(per_author, 1), 1)
+        for start in range(0, len(author_ids), authors_per_batch):
+            authors = author_ids[start:start + authors_per_batch]
+            with transaction.atomic():
+                self.bulk_create(
+                    Recipe,
+                    [
+                        Recipe(
+                            author_id=author_id,
+                            name=" ".join(self.random.sample(WORDS, 2))
+                            .capitalize(),
+                            text=" ".join(self.random.choices(WORDS, k=30)),
+                            cooking_time=self.random.randint(5, 180),
+                            image=image,
+                        )
+                        for author_id in authors
+                        for _ in range(per_author)
+                    ],
+                )
+                batch_ids = list(
+                    Recipe.objects.filter(author__in=authors)
+                    .order_by("id")
+                    .values_list("id", flat=True)
+                )
+                self.bulk_create(
+                    RecipeTag,
+                    [
+                        RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                        for recipe_id in batch_ids
+                        for tag_id in self.random.sample(
+                            tag_ids, self.random.randint(1, max_tags)
+                        )
+                    ],
+                )
+                self.bulk_create(
+                    RecipeIngredient,
+                    [
+                        RecipeIngredient(
+                            recipe_id=recipe_id,
+                            ingredient_id=ingredient_id,
+                            amount=self.random.randint(1, 500),
+                        )
+                        for recipe_id in batch_ids
+                        for ingredient_id in self.random.sample(
+                            ingredient_ids, ingredients_per_recipe
+                        )
+                    ],
+                )
+            recipe_ids += batch_ids
+            self.stdout.write(f"Рецептов: {len(recipe_ids)}")
+        return recipe_ids
+
+    def create_links(self, model, user_ids, recipe_ids, per_user):
+        per_user = min(per_user, len(recipe_ids))
+        links = [
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.random.sample(recipe_ids, per_user)
+        ]
+        self.bulk_create(model, links)
+        self.stdout.write(f"{model._meta.object_name}: {len(links)}")
+
+    def create_subscriptions(self, user_ids, per_user):
+        per_user = min(per_user, len(user_ids) - 1)
+        subscriptions = []
+        for user_id in user_ids:
+            authors = self.random.sample(user_ids, per_user + 1)
+            subscriptions += [
+                Subscription(user_id=user_id, subscribing_id=author_id)
+                for author_id in authors
+                if author_id != user_id
+            ][:per_user]
+        self.bulk_create(Subscription, subscriptions)
+        self.stdout.write(f"Подписок: {len(subscriptions)}")
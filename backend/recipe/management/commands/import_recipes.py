@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import bump_recipes_version
+from recipe.transfer import (RecordError, import_batch, matches, parse_moment,
+                             parse_record, read_checkpoint, write_checkpoint)
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает рецепты из NDJSON выгрузки export_recipes. Файлы "
+        "изображений не копируются, их нужно перенести в MEDIA_ROOT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--author",
+            action="append",
+            dest="authors",
+            help="username автора, можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--since", type=parse_moment, help="Опубликованные с этой даты"
+        )
+        parser.add_argument(
+            "--until", type=parse_moment, help="Опубликованные до этой даты"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, dest="batch_size"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Файл с числом обработанных строк, при повторном запуске "
+                "загрузка продолжается после них"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        self.checkpoint = options["checkpoint"]
+        self.line = skip = read_checkpoint(self.checkpoint).get("line", 0)
+        self.created = self.skipped = 0
+        filters = (options["authors"], options["since"], options["until"])
+        batch = []
+        number = skip
+        try:
+            with open(options["path"], encoding="utf-8") as file:
+                for number, line in enumerate(file, 1):
+                    if number <= skip or not line.strip():
+                        continue
+                    try:
+                        record = parse_record(line)
+                    except RecordError as error:
+                        raise CommandError(f"Строка {number}: {error}")
+                    if matches(record, *filters):
+                        batch.append(record)
+                    else:
+                        self.skipped += 1
+                    if len(batch) == options["batch_size"]:
+                        self.flush(batch, number)
+                        batch = []
+                self.flush(batch, max(number, skip))
+        except OSError as error:
+            raise CommandError(error)
+        finally:
+            if self.created:
+                bump_recipes_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано рецептов: {self.created}, пропущено: {self.skipped}"
+        ))
+
+    def flush(self, batch, line):
+        if batch:
+            recipe_ids, skipped = import_batch(batch)
+            self.created += len(recipe_ids)
+            self.skipped += skipped
+        if self.checkpoint and line > self.line:
+            write_checkpoint(self.checkpoint, {"line": line})
+        self.line = line
+        self.stdout.write(
+            f"Строк: {line}, создано рецептов: {self.created}"
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipe.models import Recipe
+from recipe.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = "Перестраивает поисковый индекс всех рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            dest="batch_size",
+            help="Количество рецептов в одном обновлении",
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by("id").values_list(
+            "id", flat=True
+        )
+        batch = []
+        total = 0
+        for recipe_id in recipe_ids.iterator():
+            batch.append(recipe_id)
+            if len(batch) == options["batch_size"]:
+                update_search_index(batch)
+                total += len(batch)
+                batch = []
+        update_search_index(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Поисковый индекс обновлен для {total} рецептов"
+        ))
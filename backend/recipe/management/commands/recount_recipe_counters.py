@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipe.services import recount_recipe_counters
+
+
+class Command(BaseCommand):
+    help = "Сверяет счетчики избранного и списков покупок рецептов."
+
+    def handle(self, *args, **options):
+        fixed = recount_recipe_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Исправлены счетчики рецептов: {fixed}"
+        ))
@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# icontains/istartswith в PostgreSQL строятся как UPPER("name"::text) LIKE,
+# а оператор похожести % работает с самим столбцом, поэтому индексов два.
+TRIGRAM_INDEXES = {
+    "recipe_ingredient_name_trgm": "name gin_trgm_ops",
+    "recipe_ingredient_name_upper_trgm": "(UPPER(name::text)) gin_trgm_ops",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} "
+            f"ON recipe_ingredient USING gin ({expression})"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0005_auto_20230724_2131"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.2 on 2026-10-17 00:17
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDEX_NAME = "recipe_recipe_search_vector_gin"
+
+
+def create_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+        "ON recipe_recipe USING gin (search_vector)"
+    )
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0006_ingredient_name_trigram"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="RecipeSearchTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(db_index=True, max_length=100)),
+                ("weight", models.FloatField()),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_terms",
+                        to="recipe.recipe",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="recipesearchterm",
+            constraint=models.UniqueConstraint(
+                fields=("term", "recipe"), name="unique_recipe_search_term"
+            ),
+        ),
+        migrations.RunPython(
+            create_search_vector_index, drop_search_vector_index
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2 on 2026-10-17 00:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(total=Count("id"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipe", "Recipe")
+    Recipe.objects.update(
+        favorites_count=count_subquery(apps.get_model("recipe", "Favorite")),
+        cart_count=count_subquery(apps.get_model("recipe", "ShoppingCart")),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0008_feed_entry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="cart_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В списках покупок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В избранном"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-favorites_count", "-id"],
+                name="recipe_favorites_count_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-cart_count", "-id"], name="recipe_cart_count_idx"
+            ),
+        ),
+    ]
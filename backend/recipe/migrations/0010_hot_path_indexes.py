@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-17 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0009_recipe_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="favorite",
+            index=models.Index(
+                fields=["user", "recipe"], name="favorite_user_recipe_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(fields=["name"], name="ingredient_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_author_pub_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipetag",
+            index=models.Index(
+                fields=["tag", "recipe"], name="recipetag_tag_recipe_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="shoppingcart",
+            index=models.Index(
+                fields=["user", "recipe"], name="cart_user_recipe_idx"
+            ),
+        ),
+    ]
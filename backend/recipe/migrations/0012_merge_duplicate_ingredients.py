@@ -0,0 +1,61 @@
+# Generated by Django 3.2 on 2026-10-17 03:05
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Оставляет по одной записи на название и единицу измерения.
+
+    Повторная загрузка без --delete-existing дублировала справочник.
+    Ссылки рецептов переносятся на запись с наименьшим id, а если
+    рецепт ссылался на несколько дублей, их количество суммируется
+    в одной строке.
+    """
+    Ingredient = apps.get_model("recipe", "Ingredient")
+    RecipeIngredient = apps.get_model("recipe", "RecipeIngredient")
+    duplicates = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        ingredient_ids = list(
+            Ingredient.objects.filter(
+                name=duplicate["name"],
+                measurement_unit=duplicate["measurement_unit"],
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        kept_links = {}
+        redundant_ids = []
+        for link in RecipeIngredient.objects.filter(
+            ingredient__in=ingredient_ids
+        ).order_by("recipe", "id"):
+            kept = kept_links.setdefault(link.recipe_id, link)
+            if kept is link:
+                continue
+            if link.amount is not None:
+                kept.amount = (kept.amount or 0) + link.amount
+            redundant_ids.append(link.id)
+        RecipeIngredient.objects.filter(id__in=redundant_ids).delete()
+        for link in kept_links.values():
+            link.ingredient_id = ingredient_ids[0]
+        RecipeIngredient.objects.bulk_update(
+            kept_links.values(), ["ingredient", "amount"]
+        )
+        Ingredient.objects.filter(id__in=ingredient_ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0011_recipe_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0012_merge_duplicate_ingredients"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="ingredient",
+            name="ingredient_name_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_ingredient_name_unit",
+            ),
+        ),
+    ]
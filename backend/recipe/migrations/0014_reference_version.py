@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-17 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipe", "0013_ingredient_natural_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReferenceVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label", models.CharField(max_length=100, unique=True)),
+                ("version", models.FloatField()),
+            ],
+        ),
+    ]
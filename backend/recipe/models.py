@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
 from django.db import models
 
 User = get_user_model()
 
+COUNTER_FIELDS = ("favorites_count", "cart_count")
+
 
 class Tag(models.Model):
     """Теги рецептов."""
@@ -50,6 +53,15 @@ class Ingredient(models.Model):
         blank=False,
     )
 
+    class Meta:
+        # Индекс ограничения начинается с name и заменяет индекс по имени
+        constraints = [
+            models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_ingredient_name_unit",
+            )
+        ]
+
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}"
 
@@ -87,10 +99,57 @@ class Recipe(models.Model):
         null=False,
     )
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    image_variants = models.JSONField(default=dict, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        "В избранном", default=0, editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        "В списках покупок", default=0, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=("-pub_date", "-id"), name="recipe_pub_date_idx"
+            ),
+            models.Index(
+                fields=("author", "-pub_date"),
+                name="recipe_author_pub_date_idx",
+            ),
+            models.Index(
+                fields=("-favorites_count", "-id"),
+                name="recipe_favorites_count_idx",
+            ),
+            models.Index(
+                fields=("-cart_count", "-id"), name="recipe_cart_count_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает имя изображения, чтобы удалить файл после замены."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get("image")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Не перезаписывает счетчики значениями, прочитанными ранее.
+
+        Счетчики меняются только UPDATE с F() выражениями.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class RecipeTag(models.Model):
     """Связь M2M рецептов и Тэгов."""
@@ -98,6 +157,13 @@ class RecipeTag(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=("tag", "recipe"), name="recipetag_tag_recipe_idx"
+            )
+        ]
+
     def __str__(self):
         return f"{self.recipe} {self.tag}"
 
@@ -133,6 +199,11 @@ class Favorite(models.Model):
                 fields=("recipe", "user"), name="unique_user_recipe_favorite"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=("user", "recipe"), name="favorite_user_recipe_idx"
+            )
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -148,3 +219,78 @@ class ShoppingCart(models.Model):
                 name="unique_user_recipe_shopping_card",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=("user", "recipe"), name="cart_user_recipe_idx"
+            )
+        ]
+
+
+class RecipeSearchTerm(models.Model):
+    """Инвертированный индекс поиска рецептов.
+
+    Используется на базах без полнотекстового поиска (SQLite),
+    в PostgreSQL вместо него заполняется Recipe.search_vector.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="search_terms",
+    )
+    term = models.CharField(max_length=100, db_index=True)
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("term", "recipe"), name="unique_recipe_search_term"
+            )
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок пользователя.
+
+    Заполняется при публикации рецепта для всех подписчиков автора
+    (fan-out on write). Дата публикации скопирована из рецепта, чтобы
+    лента читалась по индексу (user, -pub_date).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_user_recipe_feed"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=("user", "-pub_date"), name="feed_user_pub_date_idx"
+            )
+        ]
+
+
+class ReferenceVersion(models.Model):
+    """Метка версии справочника для снимков в памяти процессов.
+
+    Хранится в БД, чтобы изменения из команд управления были видны
+    всем воркерам независимо от бэкенда кеша.
+    """
+
+    label = models.CharField(max_length=100, unique=True)
+    version = models.FloatField()
+
+    def __str__(self):
+        return f"{self.label}: {self.version}"
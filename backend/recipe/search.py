@@ -0,0 +1,127 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Count, F, OuterRef, Subquery, Sum, TextField,
+                              Value)
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeIngredient, RecipeSearchTerm
+
+# Веса частей рецепта, как у ts_rank для меток A, B и C
+TERM_WEIGHTS = {"name": 1.0, "ingredients": 0.4, "text": 0.2}
+TERM_MAX_LENGTH = RecipeSearchTerm._meta.get_field("term").max_length
+
+
+def tokenize(text):
+    return [
+        token[:TERM_MAX_LENGTH]
+        for token in re.findall(r"\w+", (text or "").casefold())
+    ]
+
+
+def uses_search_vector():
+    return connection.vendor == "postgresql"
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковые данные рецептов после сохранения."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if uses_search_vector():
+        update_search_vectors(recipe_ids)
+    else:
+        update_search_terms(recipe_ids)
+
+
+def update_search_vectors(recipe_ids):
+    """Одним UPDATE собирает tsvector из названия, ингредиентов и текста."""
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = (
+        RecipeIngredient.objects.filter(recipe=OuterRef("pk"))
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", " "))
+        .values("names")
+    )
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        search_vector=(
+            SearchVector("name", weight="A", config=config)
+            + SearchVector(
+                Coalesce(
+                    Subquery(ingredient_names),
+                    Value(""),
+                    output_field=TextField(),
+                ),
+                weight="B",
+                config=config,
+            )
+            + SearchVector("text", weight="C", config=config)
+        )
+    )
+
+
+def update_search_terms(recipe_ids):
+    """Перестраивает записи инвертированного индекса рецептов."""
+    ingredient_names = {}
+    for recipe_id, name in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", "ingredient__name"):
+        ingredient_names.setdefault(recipe_id, []).append(name)
+
+    terms = []
+    for recipe in Recipe.objects.filter(id__in=recipe_ids).values(
+        "id", "name", "text"
+    ):
+        weights = {}
+        parts = {
+            "name": recipe["name"],
+            "ingredients": " ".join(ingredient_names.get(recipe["id"], [])),
+            "text": recipe["text"],
+        }
+        for part, text in parts.items():
+            for token in tokenize(text):
+                weights[token] = max(
+                    weights.get(token, 0), TERM_WEIGHTS[part]
+                )
+        terms.extend(
+            RecipeSearchTerm(recipe_id=recipe["id"], term=term, weight=weight)
+            for term, weight in weights.items()
+        )
+
+    RecipeSearchTerm.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def search_recipes(queryset, text):
+    """Фильтрует рецепты по запросу и аннотирует релевантность rank."""
+    if uses_search_vector():
+        query = SearchQuery(
+            text, config=settings.RECIPE_SEARCH_CONFIG, search_type="websearch"
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F("search_vector"), query)
+        )
+
+    tokens = set(tokenize(text))
+    if not tokens:
+        return queryset.none()
+    terms = RecipeSearchTerm.objects.filter(term__in=tokens)
+    matching_recipes = (
+        terms.values("recipe")
+        .annotate(matched=Count("term"))
+        .filter(matched=len(tokens))
+        .values("recipe")
+    )
+    rank = (
+        terms.filter(recipe=OuterRef("pk"))
+        .values("recipe")
+        .annotate(rank=Sum("weight"))
+        .values("rank")
+    )
+    return queryset.filter(id__in=matching_recipes).annotate(
+        rank=Subquery(rank)
+    )
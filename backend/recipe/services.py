@@ -0,0 +1,194 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, Prefetch, Q,
+                              Subquery, Sum)
+from django.db.models.functions import Coalesce
+
+from users.models import Subscription
+
+from . import feed
+from .models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+
+User = get_user_model()
+
+RECENT_RECIPES_ORDERING = ("-pub_date", "-id")
+
+
+def get_shopping_list(user):
+    """Сводный список продуктов из рецептов в списке покупок пользователя.
+
+    Количество суммируется одним агрегирующим запросом с группировкой
+    по названию ингредиента и единице измерения.
+    """
+    return (
+        RecipeIngredient.objects.filter(recipe__shoppingcart__user=user)
+        .values(
+            name=F("ingredient__name"),
+            measurement_unit=F("ingredient__measurement_unit"),
+        )
+        .annotate(total_amount=Sum("amount"))
+        .order_by("name", "measurement_unit")
+    )
+
+
+def get_subscriptions(user, recipes_limit=None):
+    """Подписки пользователя с авторами, числом и последними рецептами.
+
+    Число рецептов считается в том же запросе, а в limited_recipes
+    автора попадает не больше recipes_limit последних рецептов:
+    ограничение применяется коррелированным подзапросом в SQL.
+    """
+    recipes = Recipe.objects.order_by(*RECENT_RECIPES_ORDERING)
+    if recipes_limit is not None:
+        recipes = recipes.filter(
+            id__in=Subquery(
+                Recipe.objects.filter(author=OuterRef("author"))
+                .order_by(*RECENT_RECIPES_ORDERING)
+                .values("id")[:recipes_limit]
+            )
+        )
+    return (
+        Subscription.objects.filter(user=user)
+        .select_related("subscribing")
+        .annotate(recipes_count=Count("subscribing__recipes"))
+        .prefetch_related(
+            Prefetch(
+                "subscribing__recipes",
+                queryset=recipes.only(
+                    "id", "author_id", "name", "image", "cooking_time"
+                ),
+                to_attr="limited_recipes",
+            )
+        )
+        .order_by("id")
+    )
+
+
+def change_counters(recipe_ids, field, delta):
+    """Атомарно меняет счетчик рецептов выражением F()."""
+    if recipe_ids:
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            **{field: F(field) + delta}
+        )
+
+
+def lock_recipes(recipe_ids, *fields):
+    """Блокирует строки рецептов по возрастанию id.
+
+    Добавление и удаление связей сначала берут эти блокировки в одном
+    порядке, поэтому пересекающиеся запросы ждут друг друга, а не
+    попадают во взаимную блокировку. Связи и счетчики меняются после.
+    """
+    recipes = (
+        Recipe.objects.select_for_update()
+        .filter(id__in=recipe_ids)
+        .order_by("id")
+    )
+    return list(recipes.only("id", *fields))
+
+
+def add_recipe_links(model, user, recipe_ids, counter_field):
+    """Добавляет рецепты в избранное или список покупок.
+
+    Строки рецептов блокируются до проверки существующих связей, так
+    что параллельные запросы того же пользователя не увеличат счетчик
+    дважды. Новые связи вставляются одним INSERT. Возвращает найденные
+    рецепты, несуществующие id пропускаются.
+    """
+    with transaction.atomic():
+        recipes = lock_recipes(recipe_ids, "name", "image", "cooking_time")
+        # Отдельный запрос после блокировки видит зафиксированные связи
+        linked_ids = set(
+            model.objects.filter(user=user, recipe__in=recipes).values_list(
+                "recipe", flat=True
+            )
+        )
+        new_ids = [
+            recipe.id for recipe in recipes if recipe.id not in linked_ids
+        ]
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id) for recipe_id in new_ids],
+            ignore_conflicts=True,
+        )
+        change_counters(new_ids, counter_field, 1)
+    return recipes
+
+
+def remove_recipe_links(model, user, recipe_ids, counter_field):
+    """Удаляет рецепты из избранного или списка покупок одним DELETE.
+
+    Как и при добавлении, сначала блокируются строки рецептов: связи,
+    прочитанные после этого, уже не изменит параллельный запрос,
+    поэтому счетчик уменьшается только по действительно удаленным.
+    """
+    with transaction.atomic():
+        recipes = lock_recipes(recipe_ids)
+        linked_ids = list(
+            model.objects.filter(user=user, recipe__in=recipes).values_list(
+                "recipe", flat=True
+            )
+        )
+        model.objects.filter(user=user, recipe__in=linked_ids).delete()
+        change_counters(linked_ids, counter_field, -1)
+
+
+def subscribe(user, author_ids):
+    """Подписывает пользователя на авторов, возвращает их id.
+
+    Несуществующие авторы и сам пользователь пропускаются.
+    """
+    author_ids = list(
+        User.objects.filter(id__in=author_ids)
+        .exclude(id=user.id)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    Subscription.objects.bulk_create(
+        [
+            Subscription(user=user, subscribing_id=author_id)
+            for author_id in author_ids
+        ],
+        ignore_conflicts=True,
+    )
+    if author_ids and feed.is_enabled():
+        # bulk_create не отправляет post_save, ленту заполняем сами
+        transaction.on_commit(lambda: feed.add_author(user.id, author_ids))
+    return author_ids
+
+
+def unsubscribe(user, author_ids):
+    Subscription.objects.filter(user=user, subscribing__in=author_ids).delete()
+
+
+def count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(total=Count("id"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_recipe_counters(recipe_ids=None):
+    """Пересчитывает счетчики избранного и списков покупок.
+
+    Обновляются только разошедшиеся рецепты, возвращается их число.
+    """
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+    favorites = count_subquery(Favorite)
+    carts = count_subquery(ShoppingCart)
+    return (
+        recipes.annotate(actual_favorites=favorites, actual_carts=carts)
+        .filter(
+            ~Q(favorites_count=F("actual_favorites"))
+            | ~Q(cart_count=F("actual_carts"))
+        )
+        .update(favorites_count=favorites, cart_count=carts)
+    )
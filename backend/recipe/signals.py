@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Subscription
+
+from . import feed
+from .images import delete_variants, release_image, schedule_variants
+from .models import Recipe
+from .search import update_search_index
+
+SEARCH_FIELDS = {"name", "text"}
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_search_index_update(sender, instance, raw, update_fields,
+                                 **kwargs):
+    """Обновляет поисковые данные после фиксации транзакции.
+
+    К этому моменту сериалайзер и админка уже записали связи рецепта
+    с ингредиентами.
+    """
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(lambda: update_search_index([instance.pk]))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_feed_fan_out(sender, instance, created, raw, **kwargs):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    if created and not raw and feed.is_enabled():
+        feed.schedule_fan_out(instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def add_author_to_feed(sender, instance, created, raw, **kwargs):
+    if created and not raw and feed.is_enabled():
+        transaction.on_commit(
+            lambda: feed.add_author(
+                instance.user_id, [instance.subscribing_id]
+            )
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_author_from_feed(sender, instance, **kwargs):
+    if feed.is_enabled():
+        feed.remove_author(instance.user_id, instance.subscribing_id)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(sender, instance, raw, update_fields, **kwargs):
+    """Строит копии изображения, если оно новое или сменилось."""
+    if raw or not instance.image:
+        return
+    if update_fields is not None and "image" not in update_fields:
+        return
+    if instance.image.name != instance.image_variants.get("source"):
+        schedule_variants(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def release_replaced_image(sender, instance, raw, update_fields, **kwargs):
+    """Удаляет прежнее изображение, если на него не ссылаются рецепты."""
+    if raw or update_fields is not None and "image" not in update_fields:
+        return
+    previous = getattr(instance, "_loaded_image", None)
+    instance._loaded_image = instance.image.name
+    if previous and previous != instance.image.name:
+        storage = instance.image.storage
+        transaction.on_commit(lambda: release_image(storage, previous))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_images(sender, instance, **kwargs):
+    storage = instance.image.storage
+    name = instance.image.name
+    image_variants = instance.image_variants
+
+    def release():
+        release_image(storage, name)
+        delete_variants(storage, image_variants)
+
+    transaction.on_commit(release)
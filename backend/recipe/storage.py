@@ -0,0 +1,44 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по SHA-256 их содержимого.
+
+    Повторно загруженный файл не записывается: имя совпадает с уже
+    сохраненным. Время изменения такого файла обновляется, чтобы
+    сборщик мусора не удалил его до фиксации ссылающейся записи.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        try:
+            return self._save(name, content)
+        except FileExistsError:
+            # Тот же файл параллельно записал другой запрос
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    @staticmethod
+    def get_hashed_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory, filename = posixpath.split(name.replace("\\", "/"))
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest.hexdigest() + extension)
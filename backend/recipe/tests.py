@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from users.models import User
+
+from .models import Favorite, Recipe
+from .services import add_recipe_links, remove_recipe_links
+
+
+class RecipeLinksTest(TestCase):
+    """Счетчики меняются только на действительно добавленные связи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="reader", email="r@x.ru")
+        author = User.objects.create(username="author", email="a@x.ru")
+        cls.recipe_ids = [
+            Recipe.objects.create(
+                author=author,
+                name=f"Суп {number}",
+                text="Суп",
+                cooking_time=10,
+                image="recipes/test.png",
+            ).id
+            for number in range(3)
+        ]
+
+    def get_counters(self):
+        return list(
+            Recipe.objects.filter(id__in=self.recipe_ids)
+            .order_by("id")
+            .values_list("favorites_count", flat=True)
+        )
+
+    def test_repeated_add_and_remove(self):
+        # Порядок id в запросе не важен, несуществующий id пропускается
+        recipe_ids = self.recipe_ids[::-1] + [10 ** 9]
+        for _ in range(2):
+            recipes = add_recipe_links(
+                Favorite, self.user, recipe_ids, "favorites_count"
+            )
+            self.assertEqual(
+                [recipe.id for recipe in recipes], self.recipe_ids
+            )
+            self.assertEqual(self.get_counters(), [1, 1, 1])
+        for _ in range(2):
+            remove_recipe_links(
+                Favorite, self.user, recipe_ids[:2], "favorites_count"
+            )
+            self.assertEqual(self.get_counters(), [1, 0, 0])
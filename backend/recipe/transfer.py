@@ -0,0 +1,333 @@
+import json
+import os
+from datetime import datetime, time
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.snapshots import bump_reference_version
+from users.models import User
+
+from . import feed
+from .models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from .search import update_search_index
+
+RECORD_FIELDS = (
+    "author",
+    "name",
+    "text",
+    "cooking_time",
+    "pub_date",
+    "image",
+    "tags",
+    "ingredients",
+)
+AUTHOR_FIELDS = ("username", "email", "first_name", "last_name")
+
+
+class RecordError(ValueError):
+    """Строка выгрузки не похожа на рецепт."""
+
+
+def parse_moment(value):
+    """Дата или дата со временем из аргумента команды."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Неверная дата: {value}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_checkpoint(path, data):
+    """Записывает контрольную точку целиком или не записывает вовсе."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def filter_recipes(recipes, authors=None, since=None, until=None):
+    if authors:
+        recipes = recipes.filter(author__username__in=authors)
+    if since:
+        recipes = recipes.filter(pub_date__gte=since)
+    if until:
+        recipes = recipes.filter(pub_date__lt=until)
+    return recipes
+
+
+def serialize_recipe(recipe):
+    author = recipe.author
+    return {
+        "id": recipe.id,
+        "author": {field: getattr(author, field) for field in AUTHOR_FIELDS},
+        "name": recipe.name,
+        "text": recipe.text,
+        "cooking_time": recipe.cooking_time,
+        "pub_date": recipe.pub_date.isoformat(),
+        "image": recipe.image.name,
+        "image_variants": recipe.image_variants,
+        "tags": [
+            {
+                "name": link.tag.name,
+                "color": link.tag.color,
+                "slug": link.tag.slug,
+            }
+            for link in recipe.recipetag_set.all()
+        ],
+        "ingredients": [
+            {
+                "name": link.ingredient.name,
+                "measurement_unit": link.ingredient.measurement_unit,
+                "amount": link.amount,
+            }
+            for link in recipe.recipeingredient_set.all()
+        ],
+    }
+
+
+def export_chunks(recipes, chunk_size=500, after_id=0):
+    """Рецепты в виде словарей выгрузки, пачками по возрастанию id.
+
+    В Django 3.2 iterator() не выполняет prefetch_related, поэтому
+    пачки выбираются по ключу id > последнего выгруженного: в памяти
+    одновременно только одна пачка с тегами и ингредиентами.
+    """
+    recipes = (
+        recipes.order_by("id")
+        .select_related("author")
+        .defer("search_vector")
+        .prefetch_related(
+            Prefetch(
+                "recipetag_set",
+                queryset=RecipeTag.objects.select_related("tag").order_by(
+                    "id"
+                ),
+            ),
+            Prefetch(
+                "recipeingredient_set",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ).order_by("id"),
+            ),
+        )
+    )
+    while True:
+        chunk = list(recipes.filter(id__gt=after_id)[:chunk_size])
+        if not chunk:
+            return
+        after_id = chunk[-1].id
+        yield [serialize_recipe(recipe) for recipe in chunk]
+
+
+def parse_record(line):
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        raise RecordError(str(error))
+    if not isinstance(record, dict):
+        raise RecordError("Ожидался объект рецепта")
+    missing = [field for field in RECORD_FIELDS if field not in record]
+    author = record.get("author")
+    if missing or not isinstance(author, dict) or "username" not in author:
+        raise RecordError(f"Нет полей: {', '.join(missing) or 'username'}")
+    record["pub_date"] = parse_datetime(record["pub_date"])
+    if record["pub_date"] is None:
+        raise RecordError("Неверная дата публикации")
+    return record
+
+
+def matches(record, authors=None, since=None, until=None):
+    return (
+        (not authors or record["author"]["username"] in authors)
+        and (not since or record["pub_date"] >= since)
+        and (not until or record["pub_date"] < until)
+    )
+
+
+def get_author_ids(records):
+    """id авторов по username, недостающие создаются без пароля."""
+    authors = {
+        record["author"]["username"]: record["author"] for record in records
+    }
+    existing = dict(
+        User.objects.filter(username__in=authors).values_list(
+            "username", "id"
+        )
+    )
+    missing = [
+        author for name, author in authors.items() if name not in existing
+    ]
+    if missing:
+        # Пользователь с тем же email уже есть: рецепты будут пропущены
+        User.objects.bulk_create(
+            [
+                User(
+                    **{field: author.get(field) for field in AUTHOR_FIELDS},
+                    password=make_password(None),
+                )
+                for author in missing
+            ],
+            ignore_conflicts=True,
+        )
+        existing.update(
+            User.objects.filter(
+                username__in=[author["username"] for author in missing]
+            ).values_list("username", "id")
+        )
+    return existing
+
+
+def get_tag_ids(records):
+    tags = {tag["name"]: tag for record in records for tag in record["tags"]}
+    existing = dict(
+        Tag.objects.filter(name__in=tags).values_list("name", "id")
+    )
+    missing = [tag for name, tag in tags.items() if name not in existing]
+    if missing:
+        Tag.objects.bulk_create(
+            [
+                Tag(
+                    name=tag["name"],
+                    color=tag.get("color"),
+                    slug=tag.get("slug"),
+                )
+                for tag in missing
+            ],
+            ignore_conflicts=True,
+        )
+        existing.update(
+            Tag.objects.filter(
+                name__in=[tag["name"] for tag in missing]
+            ).values_list("name", "id")
+        )
+        transaction.on_commit(lambda: bump_reference_version(Tag))
+    return existing
+
+
+def get_ingredient_ids(records):
+    keys = {
+        (ingredient["name"], ingredient["measurement_unit"])
+        for record in records
+        for ingredient in record["ingredients"]
+    }
+    names = {name for name, _ in keys}
+    existing = {
+        (name, unit): ingredient_id
+        for ingredient_id, name, unit in Ingredient.objects.filter(
+            name__in=names
+        ).values_list("id", "name", "measurement_unit")
+    }
+    missing = keys - existing.keys()
+    if missing:
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in missing
+            ],
+            ignore_conflicts=True,
+        )
+        existing.update(
+            ((name, unit), ingredient_id)
+            for ingredient_id, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in missing}
+            ).values_list("id", "name", "measurement_unit")
+        )
+        transaction.on_commit(lambda: bump_reference_version(Ingredient))
+    return existing
+
+
+def create_recipes(recipes):
+    """bulk_create, после которого у рецептов заполнены id."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes)
+    # SQLite внутри транзакции выдает id по порядку вставки
+    last_id = Recipe.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+    Recipe.objects.bulk_create(recipes)
+    ids = Recipe.objects.filter(id__gt=last_id).order_by("id").values_list(
+        "id", flat=True
+    )
+    for recipe, recipe_id in zip(recipes, ids):
+        recipe.id = recipe_id
+    return recipes
+
+
+def import_batch(records):
+    """Создает рецепты пачки, возвращает id созданных и число пропущенных.
+
+    Авторы сопоставляются по username, теги по названию, ингредиенты
+    по названию и единице измерения, недостающие создаются. Рецепт,
+    у которого уже есть копия с тем же автором, названием и датой
+    публикации, пропускается, поэтому файл можно загружать повторно.
+    """
+    with transaction.atomic():
+        author_ids = get_author_ids(records)
+        tag_ids = get_tag_ids(records)
+        ingredient_ids = get_ingredient_ids(records)
+        existing = set(
+            Recipe.objects.filter(
+                author__in=author_ids.values(),
+                pub_date__in={record["pub_date"] for record in records},
+            ).values_list("author_id", "name", "pub_date")
+        )
+        pending = []
+        for record in records:
+            author_id = author_ids.get(record["author"]["username"])
+            key = (author_id, record["name"], record["pub_date"])
+            if author_id is None or key in existing:
+                continue
+            existing.add(key)
+            pending.append((
+                record,
+                Recipe(
+                    author_id=author_id,
+                    name=record["name"],
+                    text=record["text"],
+                    cooking_time=record["cooking_time"],
+                    image=record["image"],
+                    image_variants=record.get("image_variants") or {},
+                ),
+            ))
+        if not pending:
+            return [], len(records)
+        recipes = create_recipes([recipe for _, recipe in pending])
+        # auto_now_add заменяет дату при вставке, исходная ставится после
+        for record, recipe in pending:
+            recipe.pub_date = record["pub_date"]
+        Recipe.objects.bulk_update(recipes, ["pub_date"])
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe_id=recipe.id, tag_id=tag_ids[tag["name"]])
+            for record, recipe in pending
+            for tag in record["tags"]
+            if tag["name"] in tag_ids
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient_ids[
+                    ingredient["name"], ingredient["measurement_unit"]
+                ],
+                amount=ingredient.get("amount"),
+            )
+            for record, recipe in pending
+            for ingredient in record["ingredients"]
+        )
+        recipe_ids = [recipe.id for recipe in recipes]
+        update_search_index(recipe_ids)
+        if feed.is_enabled():
+            feed.fan_out_recipes(recipe_ids)
+    return recipe_ids, len(records) - len(recipe_ids)